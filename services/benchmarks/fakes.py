@@ -0,0 +1,314 @@
+"""
+In-process stand-ins for the providers the pipeline and the summarization
+service talk to: MediaWiki, Gemini, Groq, Polly and Cloudinary.
+
+Each fake sleeps for a configurable latency, fails at a configurable rate and
+counts the calls it served, so benchmarks run offline without spending any
+provider quota.
+"""
+
+import asyncio
+import collections
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from aiohttp import web
+
+# Folder the fake Cloudinary uploads pretend to store the audio files in
+ROOT_ASSETS_PATH = "summary_audio_files"
+
+
+class FakeProfile:
+    """Latency and error rate of a fake provider."""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0):
+        """
+        :param latency_ms: Mean latency of a call.
+        :param jitter_ms: Latency is drawn uniformly within latency_ms +/- jitter_ms.
+        :param error_rate: Fraction of the calls that fail, between 0 and 1.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self) -> float:
+        return max(0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+    def sleep(self) -> None:
+        time.sleep(self.delay())
+
+
+class CallCounter:
+    """Thread-safe counter of the calls served by the fakes, keyed by call type."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def add(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self.counts[name] += count
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class FakeProviderError(RuntimeError):
+    """
+    Throttling error shaped like the provider clients' own: an HTTP status
+    (groq, google-genai) or a botocore error response (Polly).
+    """
+
+    def __init__(self, message: str, status_code: int = 429, aws_code: str | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = {
+            "Error": {"Code": aws_code},
+            "ResponseMetadata": {"HTTPStatusCode": status_code, "HTTPHeaders": {}},
+        } if aws_code else None
+
+
+class FakeMediaWiki:
+    """
+    MediaWiki API served by aiohttp on a background thread.
+
+    Responses come from a recording (see record_fixtures.py) when it has the
+    requested category or title, and are synthesized deterministically
+    otherwise, so any number of categories and pages can be served.
+    """
+
+    MEMBERS_PER_CATEGORY = 200
+
+    def __init__(self, profile: FakeProfile, counter: CallCounter, fixtures_path: str | None = None):
+        self.profile = profile
+        self.counter = counter
+        self.fixtures = {"categorymembers": {}, "pages": {}}
+        if fixtures_path:
+            with open(fixtures_path) as f:
+                self.fixtures.update(json.load(f))
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self.url = None
+
+    def start(self) -> str:
+        """
+        Start serving on a free local port.
+
+        :return: The URL of the api.php endpoint.
+        """
+        app = web.Application()
+        app.router.add_get("/w/api.php", self._api)
+        self._runner = web.AppRunner(app)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{port}/w/api.php"
+        return self.url
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _api(self, request: web.Request) -> web.Response:
+        query = request.query
+        await asyncio.sleep(self.profile.delay())
+        if query.get("list") == "categorymembers":
+            call_type = "mediawiki.categorymembers"
+        elif "titles" in query:
+            call_type = "mediawiki.pages"
+        else:
+            call_type = "mediawiki.other"
+        self.counter.add(call_type)
+        if self.profile.fails():
+            self.counter.add(f"{call_type}.error")
+            return web.json_response({"error": {"code": "ratelimited"}}, status=429, headers={"Retry-After": "1"})
+
+        if call_type == "mediawiki.categorymembers":
+            return web.json_response(self._category_members(query))
+        if call_type == "mediawiki.pages":
+            return web.json_response({"query": {"pages": [self._page(title) for title in query["titles"].split("|")]}})
+        return web.json_response({"error": {"code": "badquery"}}, status=400)
+
+    def _category_members(self, query) -> dict:
+        category = query["cmtitle"]
+        limit = self.MEMBERS_PER_CATEGORY if query.get("cmlimit") == "max" else int(query.get("cmlimit", 10))
+        types = query.get("cmtype", "page").split("|")
+        members = self.fixtures["categorymembers"].get(category)
+        if members is None:
+            name = category.split(":", 1)[1]
+            members = [
+                {"pageid": self._page_id(f"{name} {i}"), "ns": 0, "title": f"{name} {i}"}
+                for i in range(self.MEMBERS_PER_CATEGORY)
+            ]
+            # Every synthesized category has two subcategories, two levels deep
+            if category.count("/") < 2:
+                members = [
+                    {"pageid": self._page_id(f"{category}/{i}"), "ns": 14, "title": f"{category}/{i}"}
+                    for i in range(2)
+                ] + members
+        members = [
+            member for member in members
+            if ("subcat" if member["ns"] == 14 else "page") in types
+        ]
+        start = int(query.get("cmcontinue") or 0)
+        response = {"batchcomplete": True, "query": {"categorymembers": members[start:start + limit]}}
+        if start + limit < len(members):
+            response["continue"] = {"cmcontinue": str(start + limit), "continue": "-||"}
+        return response
+
+    def _page(self, title: str) -> dict:
+        if title in self.fixtures["pages"]:
+            return self.fixtures["pages"][title]
+        page_id = self._page_id(title)
+        page = {
+            "pageid": page_id,
+            "ns": 0,
+            "title": title,
+            "extract": f"{title} is a synthesized article used by the offline benchmarks. " * 8,
+        }
+        # Like real categories, some pages have no usable lead image
+        if page_id % 10:
+            page["original"] = {"source": f"https://upload.wikimedia.org/fake/{page_id}.jpg", "width": 800, "height": 600}
+        return page
+
+    @staticmethod
+    def _page_id(title: str) -> int:
+        return int(hashlib.sha1(title.encode("utf-8")).hexdigest()[:12], 16)
+
+
+class _FakeEmbedding:
+    def __init__(self, values: list[float]):
+        self.values = values
+
+
+class _FakeEmbedResult:
+    def __init__(self, embeddings: list[_FakeEmbedding]):
+        self.embeddings = embeddings
+
+
+class FakeGeminiClient:
+    """Stand-in for google.genai.Client returning deterministic synthetic embeddings."""
+
+    DIMENSIONS = 768
+
+    def __init__(self, profile: FakeProfile, counter: CallCounter):
+        self.profile = profile
+        self.counter = counter
+        self.models = self
+
+    def embed_content(self, model: str, contents: list[str] | str, config=None) -> _FakeEmbedResult:
+        contents = [contents] if isinstance(contents, str) else contents
+        self.profile.sleep()
+        self.counter.add("gemini.embed_content")
+        self.counter.add("gemini.embedded_records", len(contents))
+        if self.profile.fails():
+            self.counter.add("gemini.embed_content.error")
+            raise FakeProviderError("429 RESOURCE_EXHAUSTED (fake)")
+        return _FakeEmbedResult([_FakeEmbedding(self._vector(text)) for text in contents])
+
+    def _vector(self, text: str) -> list[float]:
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        return [rng.uniform(-1, 1) for _ in range(self.DIMENSIONS)]
+
+
+class _Namespace:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class FakeGroq:
+    """Stand-in for groq.Groq returning a fixed summary."""
+
+    def __init__(self, profile: FakeProfile, counter: CallCounter):
+        self.profile = profile
+        self.counter = counter
+        self.chat = _Namespace(completions=_Namespace(create=self._create))
+
+    def _create(self, messages: list[dict], model: str, **kwargs):
+        self.profile.sleep()
+        self.counter.add("groq.chat")
+        if self.profile.fails():
+            self.counter.add("groq.chat.error")
+            raise FakeProviderError("429 rate_limit_exceeded (fake)")
+        content = "A short synthesized summary of the article, read out by the offline benchmarks."
+        return _Namespace(choices=[_Namespace(message=_Namespace(content=content))])
+
+
+class FakePolly:
+    """Stand-in for the boto3 Polly client returning synthetic audio bytes."""
+
+    def __init__(self, profile: FakeProfile, counter: CallCounter, audio_bytes: int = 64 * 1024):
+        self.profile = profile
+        self.counter = counter
+        self.audio_bytes = audio_bytes
+
+    def synthesize_speech(self, **kwargs) -> dict:
+        self.profile.sleep()
+        self.counter.add("polly.synthesize_speech")
+        if self.profile.fails():
+            self.counter.add("polly.synthesize_speech.error")
+            raise FakeProviderError("ThrottlingException (fake)", 400, aws_code="ThrottlingException")
+        return {"AudioStream": io.BytesIO(b"\xff" * self.audio_bytes)}
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, body: dict):
+        self.status_code = status_code
+        self._body = body
+        self.text = json.dumps(body)
+        self.headers = {}
+
+    def json(self) -> dict:
+        return self._body
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            error = RuntimeError(f"{self.status_code} error (fake)")
+            error.response = self
+            raise error
+
+
+class FakeCloudinarySession:
+    """
+    Stand-in for the requests.Session used for Cloudinary uploads.
+
+    Consumes the (possibly streamed) body like the real endpoint would and
+    answers with an upload response.
+    """
+
+    def __init__(self, profile: FakeProfile, counter: CallCounter):
+        self.profile = profile
+        self.counter = counter
+
+    def post(self, url: str, data=None, files=None, **kwargs) -> _FakeResponse:
+        if files:
+            size = sum(len(f.read()) for f in files.values())
+        elif isinstance(data, (bytes, str)):
+            size = len(data)
+        else:
+            size = sum(len(chunk) for chunk in data or ())
+        self.profile.sleep()
+        self.counter.add("cloudinary.upload")
+        self.counter.add("cloudinary.uploaded_bytes", size)
+        if self.profile.fails():
+            self.counter.add("cloudinary.upload.error")
+            return _FakeResponse(500, {"error": {"message": "fake failure"}})
+        public_id = f"{ROOT_ASSETS_PATH}/{random.getrandbits(48):x}"
+        return _FakeResponse(200, {
+            "secure_url": f"https://res.cloudinary.com/fake/video/upload/{public_id}.mp3",
+            "public_id": public_id,
+            "format": "mp3",
+            "duration": 15.0,
+            "bytes": size,
+            "audio": {"codec": "mp3", "frequency": 22050, "channels": 1},
+        })
+
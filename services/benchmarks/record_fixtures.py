@@ -0,0 +1,77 @@
+"""
+Record live MediaWiki responses for the offline benchmarks.
+
+Stores the members of the given categories and the extract and lead image
+of every listed page in the format FakeMediaWiki replays.
+
+Usage:
+    python services/benchmarks/record_fixtures.py fixtures/mediawiki.json "Physics" "Film" [--members 50]
+"""
+
+import argparse
+import json
+import requests
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+HEADERS = {
+    'User-Agent': 'WikipediaScraper/1.0 (contact@wikitok.com)'
+}
+BASE_PARAMS = {
+    "action": "query",
+    "format": "json",
+    "formatversion": "2"
+}
+
+
+def record(categories: list[str], members_per_category: int) -> dict:
+    fixtures = {"categorymembers": {}, "pages": {}}
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    for category in categories:
+        params = BASE_PARAMS.copy()
+        params.update({
+            "list": "categorymembers",
+            "cmtype": "page|subcat",
+            "cmtitle": f"Category:{category}",
+            "cmlimit": str(members_per_category)
+        })
+        response = session.get(API_URL, params=params, timeout=10)
+        response.raise_for_status()
+        members = response.json()["query"]["categorymembers"]
+        fixtures["categorymembers"][f"Category:{category}"] = members
+
+        titles = [member["title"] for member in members if member["ns"] == 0]
+        # Intro extracts are capped at 20 pages per request
+        for i in range(0, len(titles), 20):
+            params = BASE_PARAMS.copy()
+            params.update({
+                "prop": "extracts|pageimages",
+                "exintro": "1",
+                "exlimit": "max",
+                "explaintext": "1",
+                "piprop": "original",
+                "pilimit": "max",
+                "titles": "|".join(titles[i:i + 20])
+            })
+            response = session.get(API_URL, params=params, timeout=10)
+            response.raise_for_status()
+            for page in response.json()["query"]["pages"]:
+                fixtures["pages"][page["title"]] = page
+        print(f"Recorded Category:{category}, {len(members)} members")
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="Path of the fixtures file to write")
+    parser.add_argument("categories", nargs="+", help="Categories to record, without the Category: prefix")
+    parser.add_argument("--members", type=int, default=50, help="Members recorded per category")
+    args = parser.parse_args()
+
+    fixtures = record(args.categories, args.members)
+    with open(args.output, "w") as f:
+        json.dump(fixtures, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
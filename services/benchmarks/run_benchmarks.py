@@ -0,0 +1,300 @@
+"""
+Offline benchmarks of the Wikipedia data pipeline and the summarization service.
+
+Runs both services end to end against the in-process fakes of fakes.py:
+the pipeline's get_wikipedia_articles talks to a fake MediaWiki server, a
+fake Gemini client and the real summarization service, which itself runs on
+a local HTTP server with fake Groq, Polly and Cloudinary clients. Reports
+throughput, p50/p95/p99 latencies and provider calls per stored article, and
+exits with status 1 when a --max-* threshold is exceeded so regressions fail CI.
+
+The codec benchmark reports the size and search recall of every embedding
+codec on synthetic clustered embeddings.
+
+Usage, with the requirements of both services installed:
+    python services/benchmarks/run_benchmarks.py [--articles 100] [--latency-ms 50] [--error-rate 0.01]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_DIR = os.path.join(BENCHMARKS_DIR, "..", "wikipedia-data-pipeline")
+SERVICE_DIR = os.path.join(BENCHMARKS_DIR, "..", "content-summarization-service")
+COMMON_DIR = os.path.join(BENCHMARKS_DIR, "..", "common")
+sys.path[:0] = [BENCHMARKS_DIR, PIPELINE_DIR, SERVICE_DIR, COMMON_DIR]
+
+from fakes import (  # noqa: E402
+    CallCounter,
+    FakeCloudinarySession,
+    FakeGeminiClient,
+    FakeGroq,
+    FakeMediaWiki,
+    FakePolly,
+    FakeProfile,
+)
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """
+    Nearest-rank p50, p95 and p99 of values, in the values' unit.
+    """
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 2)
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99)}
+
+
+def start_summarization_service(profiles: dict[str, FakeProfile], counter: CallCounter) -> str:
+    """
+    Serve the summarization Flask app on a free local port with fake provider clients.
+
+    :return: The base URL of the service.
+    """
+    from werkzeug.serving import make_server
+    from app.services import clients
+    from main import app
+
+    groq = FakeGroq(profiles["groq"], counter)
+    polly = FakePolly(profiles["polly"], counter)
+    cloudinary = FakeCloudinarySession(profiles["cloudinary"], counter)
+    clients.create_groq_client = lambda: groq
+    clients.create_polly_client = lambda region_name: polly
+    clients.create_http_session = lambda: cloudinary
+
+    def counting_app(environ, start_response):
+        counter.add(f"service {environ['REQUEST_METHOD']} {environ['PATH_INFO']}")
+        return app(environ, start_response)
+
+    server = make_server("127.0.0.1", 0, counting_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def benchmark_pipeline(args, profiles: dict[str, FakeProfile], counter: CallCounter, service_url: str) -> dict:
+    """
+    Run get_wikipedia_articles args.runs times against the fakes.
+    """
+    import gemini_service
+    import wikipedia_data_pipeline
+
+    wiki = FakeMediaWiki(profiles["mediawiki"], counter, fixtures_path=args.fixtures)
+    wikipedia_data_pipeline.API_URL = wiki.start()
+    gemini = FakeGeminiClient(profiles["gemini"], counter)
+    gemini_service.genai.Client = lambda api_key, **kwargs: gemini
+
+    secrets = {
+        "GEMINI_KEY": "fake",
+        "SUMMARIZATION_SERVICE_URL": service_url,
+        "MAX_ARTICLES": str(args.articles),
+        "ARTICLES_PER_CATEGORY": str(math.ceil(args.articles / len(wikipedia_data_pipeline.CATEGORIES))),
+        "WIKIPEDIA_RATE_LIMIT": str(args.provider_rate_limit),
+        "GEMINI_RATE_LIMIT": str(args.provider_rate_limit),
+        "SUMMARIZATION_RATE_LIMIT": str(args.provider_rate_limit),
+    }
+    before = counter.snapshot()
+    durations = []
+    stored = 0
+    try:
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            articles = wikipedia_data_pipeline.get_wikipedia_articles(secrets)
+            durations.append(time.perf_counter() - start)
+            stored += len(articles)
+    finally:
+        wiki.stop()
+
+    calls = {
+        name: count - before.get(name, 0)
+        for name, count in counter.snapshot().items()
+        if count - before.get(name, 0) and not name.endswith(("_records", "_bytes"))
+    }
+    requests = {name: count for name, count in calls.items() if not name.endswith(".error")}
+    return {
+        "runs": args.runs,
+        "stored_articles": stored,
+        "throughput_articles_per_s": round(stored / sum(durations), 2) if durations else None,
+        "run_seconds": percentiles(durations),
+        "calls": calls,
+        "requests_per_stored_article": {
+            name: round(count / stored, 3) for name, count in requests.items()
+        } if stored else {},
+        "provider_requests_per_stored_article": round(
+            sum(count for name, count in requests.items() if not name.startswith("service")) / stored, 3
+        ) if stored else None,
+    }
+
+
+def benchmark_service(args, counter: CallCounter, service_url: str) -> dict:
+    """
+    Drive /summarize and /summarize/batch over HTTP with args.concurrency clients.
+    """
+    import requests
+
+    session = requests.Session()
+    # Unique content per run so the service's result cache doesn't serve the requests
+    run_id = uuid.uuid4().hex
+
+    def article(i: int) -> dict:
+        return {
+            "article_id": i + 1,
+            "article_title": f"Benchmark article {i}",
+            "article_description": f"Benchmark run {run_id}, article {i}."
+        }
+
+    def post(endpoint: str, body: dict) -> tuple[float, bool]:
+        start = time.perf_counter()
+        response = session.post(f"{service_url}/{endpoint}", json=body)
+        return (time.perf_counter() - start) * 1000, response.ok
+
+    report = {}
+    before = counter.snapshot()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(lambda i: post("summarize", article(i)), range(args.requests)))
+    elapsed = time.perf_counter() - start
+    report["summarize"] = {
+        "requests": args.requests,
+        "errors": sum(1 for _, ok in results if not ok),
+        "throughput_requests_per_s": round(args.requests / elapsed, 2),
+        "latency_ms": percentiles([latency for latency, _ in results]),
+    }
+
+    batches = [
+        [article(args.requests + i) for i in range(start, min(start + args.batch_size, args.requests))]
+        for start in range(0, args.requests, args.batch_size)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(lambda batch: post("summarize/batch", {"articles": batch}), batches))
+    elapsed = time.perf_counter() - start
+    report["summarize_batch"] = {
+        "batches": len(batches),
+        "batch_size": args.batch_size,
+        "errors": sum(1 for _, ok in results if not ok),
+        "throughput_articles_per_s": round(args.requests / elapsed, 2),
+        "latency_ms": percentiles([latency for latency, _ in results]),
+    }
+    report["calls"] = {
+        name: count - before.get(name, 0)
+        for name, count in counter.snapshot().items()
+        if count - before.get(name, 0) and not name.endswith(("_records", "_bytes"))
+    }
+    return report
+
+
+def benchmark_codecs(args) -> dict:
+    """
+    Size of an embedding in every form, and recall at 10 against float32, of every codec of args.codecs.
+    """
+    import numpy as np
+    from embedding_codec import EmbeddingCodec, measure_recall
+
+    # Clusters of topics, so nearest neighbours mean something
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(1, args.codec_vectors // 40), FakeGeminiClient.DIMENSIONS))
+    vectors = centers[rng.integers(0, len(centers), args.codec_vectors)]
+    vectors = vectors + 0.6 * rng.normal(size=vectors.shape)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    report = {"vectors": args.codec_vectors, "json_list_chars": len(json.dumps(vectors[0].tolist()))}
+    for spec in args.codecs.split(","):
+        codec = EmbeddingCodec.from_spec(spec)
+        report[spec] = {
+            "binary_bytes": len(codec.encode(vectors[0])),
+            "base64_chars": len(codec.to_wire(vectors[0])),
+            "pgvector_chars": len(codec.to_pgvector(vectors[0])),
+            "in_memory_bytes": codec.roundtrip(vectors[0]).nbytes,
+            "recall_at_10": round(measure_recall(vectors, codec, k=10), 4),
+        }
+    return report
+
+
+def check_thresholds(args, report: dict) -> list[str]:
+    failures = []
+    pipeline = report.get("pipeline")
+    if pipeline and args.max_requests_per_article is not None:
+        value = pipeline["provider_requests_per_stored_article"]
+        if value is None or value > args.max_requests_per_article:
+            failures.append(f"provider requests per stored article {value} > {args.max_requests_per_article}")
+    service = report.get("service")
+    if service and args.max_p95_ms is not None:
+        value = service["summarize"]["latency_ms"]["p95"]
+        if value is None or value > args.max_p95_ms:
+            failures.append(f"/summarize p95 latency {value} ms > {args.max_p95_ms} ms")
+    codecs = report.get("codecs")
+    if codecs and args.min_codec_recall is not None:
+        for spec in args.codecs.split(","):
+            value = codecs[spec]["recall_at_10"]
+            if value < args.min_codec_recall:
+                failures.append(f"{spec} recall at 10 {value} < {args.min_codec_recall}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=["pipeline", "service", "codecs"], help="Run a single benchmark")
+    parser.add_argument("--articles", type=int, default=100, help="MAX_ARTICLES of every pipeline run")
+    parser.add_argument("--runs", type=int, default=3, help="Pipeline runs")
+    parser.add_argument("--requests", type=int, default=200, help="Articles sent to the service")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients of the service")
+    parser.add_argument("--batch-size", type=int, default=16, help="Articles per /summarize/batch request")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Mean latency of every fake provider")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Latency jitter of every fake provider")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of failing provider calls")
+    parser.add_argument("--provider-rate-limit", type=int, default=1000,
+                        help="Calls per second allowed to every provider, high by default to measure the code rather than the quotas")
+    parser.add_argument("--codecs", default="float32,float16,int8,int8:256", help="Embedding codec specs to compare")
+    parser.add_argument("--codec-vectors", type=int, default=2000, help="Synthetic embeddings of the codec benchmark")
+    parser.add_argument("--fixtures", default=os.path.join(BENCHMARKS_DIR, "fixtures", "mediawiki_sample.json"),
+                        help="Recorded MediaWiki responses to replay")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--max-requests-per-article", type=float, help="Fail above this many provider requests per stored article")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail above this /summarize p95 latency")
+    parser.add_argument("--min-codec-recall", type=float, help="Fail when a codec's recall at 10 is below this")
+    args = parser.parse_args()
+
+    # Keep the service's result cache out of the way of other runs, Constants
+    # reads it when the app is imported
+    os.environ["RESULT_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="scrollpedia-bench-"), "result_cache.sqlite3")
+    for name in ("LLM_RATE_LIMIT", "TTS_RATE_LIMIT", "UPLOAD_RATE_LIMIT"):
+        os.environ[name] = str(args.provider_rate_limit)
+
+    profile = FakeProfile(args.latency_ms, args.jitter_ms, args.error_rate)
+    profiles = {name: profile for name in ("mediawiki", "gemini", "groq", "polly", "cloudinary")}
+    counter = CallCounter()
+    service_url = start_summarization_service(profiles, counter)
+
+    report = {}
+    if args.only in (None, "pipeline"):
+        report["pipeline"] = benchmark_pipeline(args, profiles, counter, service_url)
+    if args.only in (None, "service"):
+        report["service"] = benchmark_service(args, counter, service_url)
+    if args.only in (None, "codecs"):
+        report["codecs"] = benchmark_codecs(args)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_thresholds(args, report)
+    for failure in failures:
+        print(f"Benchmark threshold exceeded: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
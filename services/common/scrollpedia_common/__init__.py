@@ -0,0 +1,8 @@
+"""
+Code shared by the Wikipedia data pipeline and the summarization service:
+the metrics registry and the resilience policies of provider calls.
+
+Both deployments install it, the service through its requirements.txt, and
+the pipeline's Modal image ships it from the local install:
+    pip install -e services/common
+"""
@@ -0,0 +1,252 @@
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the duration histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Bucketed distribution of observed durations."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Upper bound of the bucket holding the q-quantile, the max for the last bucket.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Lightweight registry of counters and duration histograms.
+
+    Series are identified by a name and optional labels. The registry can be
+    exported as a JSON run report or in the Prometheus text format.
+
+    Every process keeps its own registry. Processes serving one endpoint
+    (gunicorn workers, job workers) dump theirs to a shared directory and
+    the endpoint exports their sum, see dump and collect. The files of
+    processes that exited are kept, so counters never go down.
+    """
+
+    def __init__(self, namespace: str):
+        """
+        :param namespace: Prefix of every exported Prometheus metric name.
+        """
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, Histogram] = {}
+        self.started_at = time.time()
+        # Name of the dump of this process, renewed in forked children
+        self._dump_pid = None
+        self._dump_name = None
+
+    @staticmethod
+    def _key(name: str, labels: dict[str, str]) -> tuple:
+        return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+    def increment(self, name: str, amount: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(seconds)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Time the enclosed block into the name histogram, counting failures in
+        name_errors. Works around awaits too.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def report(self) -> dict:
+        """
+        Snapshot of every series, ready to be dumped as JSON.
+        """
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "elapsed_seconds": round(time.time() - self.started_at, 3),
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "spans": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "total_seconds": round(histogram.sum, 4),
+                        "p50_seconds": histogram.quantile(0.5),
+                        "p95_seconds": histogram.quantile(0.95),
+                        "p99_seconds": histogram.quantile(0.99),
+                        "max_seconds": round(histogram.max, 4),
+                    }
+                    for (name, labels), histogram in sorted(self._histograms.items())
+                ],
+            }
+
+    def snapshot(self) -> dict:
+        """
+        Raw state of every series, which merge adds to another registry.
+        """
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [
+                    [name, list(labels), list(histogram.buckets), histogram.bucket_counts, histogram.sum, histogram.max]
+                    for (name, labels), histogram in self._histograms.items()
+                ],
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        with self._lock:
+            self.started_at = min(self.started_at, snapshot["started_at"])
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, buckets, bucket_counts, total, maximum in snapshot["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(tuple(buckets))
+                histogram = self._histograms[key]
+                histogram.bucket_counts = [a + b for a, b in zip(histogram.bucket_counts, bucket_counts)]
+                histogram.count += sum(bucket_counts)
+                histogram.sum += total
+                histogram.max = max(histogram.max, maximum)
+
+    def dump(self, directory: str) -> None:
+        """
+        Write the snapshot of this process to directory, replacing its previous dump.
+        """
+        if self._dump_pid != os.getpid():
+            self._dump_pid = os.getpid()
+            self._dump_name = f"{self._dump_pid}-{uuid.uuid4().hex}.json"
+        os.makedirs(directory, exist_ok=True)
+        # Written aside then renamed, a concurrent collect never reads half a dump
+        fd, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary_path, os.path.join(directory, self._dump_name))
+
+    def dump_periodically(self, directory: str, interval: float) -> threading.Event:
+        """
+        Dump every interval seconds from a daemon thread.
+
+        :return: Event stopping the thread once set.
+        """
+        stop = threading.Event()
+
+        def run() -> None:
+            while not stop.wait(interval):
+                self.dump(directory)
+
+        threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+        return stop
+
+    @classmethod
+    def collect(cls, directory: str, namespace: str) -> "Metrics":
+        """
+        Sum the dumps of every process in directory into a new registry.
+        """
+        collected = cls(namespace)
+        if not os.path.isdir(directory):
+            return collected
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, file_name)) as file:
+                    collected.merge(json.load(file))
+            except (OSError, ValueError) as e:
+                print(f"Skipping metrics dump {file_name}: {e}")
+        return collected
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Every series in the Prometheus text exposition format. Counters get a
+        _total suffix, spans are exported as _seconds histograms.
+        """
+        def format_labels(labels: tuple, extra: tuple = ()) -> str:
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{self.namespace}_{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = f"{self.namespace}_{name}_seconds"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f"{metric}_bucket{format_labels(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{metric}_bucket{format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Registry of the process, every deployment sets its own namespace
+metrics = Metrics("scrollpedia")
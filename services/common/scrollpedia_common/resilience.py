@@ -0,0 +1,343 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Awaitable, Callable
+from scrollpedia_common.metrics import metrics
+
+# Responses worth another attempt, 429 also slows the token bucket down
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# Error codes botocore reports when AWS throttles a client
+THROTTLING_ERROR_CODES = {"Throttling", "ThrottlingException", "TooManyRequestsException", "RequestLimitExceeded", "SlowDown"}
+# Exception class name fragments of network failures, across aiohttp,
+# requests, httpx (groq, google-genai) and botocore
+NETWORK_ERROR_MARKERS = ("Connect", "Timeout", "Disconnected")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"Circuit of {provider} is open, retry in {retry_in:.1f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Seconds to wait according to a Retry-After header, given in seconds or as an HTTP date.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def classify_error(error: BaseException) -> tuple[bool, bool, float | None]:
+    """
+    Tell transient provider failures from the others, whatever the client library.
+
+    :return: Whether the call is worth retrying, whether the provider
+             throttled it, and the delay it asked for with Retry-After.
+    """
+    status = None
+    code = None
+    headers = {}
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        code = response.get("Error", {}).get("Code")
+        metadata = response.get("ResponseMetadata", {})
+        status = metadata.get("HTTPStatusCode")
+        headers = metadata.get("HTTPHeaders") or {}
+    elif response is not None:
+        # requests and httpx responses
+        status = getattr(response, "status_code", None)
+        headers = getattr(response, "headers", None) or {}
+    # aiohttp, groq and google-genai errors carry the status themselves
+    for attribute in ("status", "status_code", "code"):
+        value = getattr(error, attribute, None)
+        if status is None and isinstance(value, int):
+            status = value
+    headers = headers or getattr(error, "headers", None) or {}
+
+    if status is None and code is None:
+        retryable = isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or any(
+            marker in cls.__name__ for cls in type(error).__mro__ for marker in NETWORK_ERROR_MARKERS
+        )
+        return retryable, False, None
+    throttled = status == 429 or code in THROTTLING_ERROR_CODES
+    retry_after = parse_retry_after(headers.get("Retry-After") or headers.get("retry-after"))
+    return throttled or status in RETRYABLE_STATUSES, throttled, retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose rate adapts to the provider.
+
+    Every call takes a token, tokens refill at rate per second up to burst.
+    When the provider throttles, the rate is halved (down to min_rate), and
+    every success brings it back up towards the configured rate, so callers
+    settle at the highest rate the provider sustains.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None, min_rate: float | None = None):
+        """
+        :param rate: Maximum number of calls per second.
+        :param burst: Calls allowed at once after an idle period, defaults to one second worth of calls.
+        :param min_rate: Floor of the rate when throttled, defaults to rate / 16.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, possibly ahead of time.
+
+        :return: Seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def throttled(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # A burst of 429s is a single signal, halve at most once per second
+            if now - self.decreased_at >= 1:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.decreased_at = now
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after failure_threshold consecutive failures.
+
+    Once open, calls are refused for reset_timeout seconds, then a single
+    probe call is let through: its success closes the circuit again, its
+    failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    # Seconds other callers wait between checks while the probe is in flight
+    PROBE_POLL_INTERVAL = 0.5
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> float:
+        """
+        Check whether a call may go through.
+
+        :return: 0 if it may, otherwise the seconds to wait before asking again.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                # This caller is the probe
+                self.state = self.HALF_OPEN
+                return 0
+            return self.PROBE_POLL_INTERVAL
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> bool:
+        """
+        :return: Whether this failure opened the circuit.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def abandon(self) -> None:
+        """
+        Give the probe slot back when a call was cancelled before it could tell anything.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+
+class ProviderPolicy:
+    """
+    Rate limit, retries and circuit breaker shared by every call to one provider.
+
+    Calls wait for a token of the provider's adaptive TokenBucket, transient
+    failures (network errors, timeouts, 408, 429 and 5xx responses, AWS
+    throttling) are retried with full jitter exponential backoff, and never
+    before the provider's Retry-After. Timeouts are set on the clients
+    themselves, the policy only sees them as transient failures. Clients
+    whose errors classify_error can't read get a classify of their own.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float | None = None,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20,
+        max_retry_after: float = 60,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        wait_when_open: bool = False,
+        classify: Callable[[BaseException], tuple[bool, bool, float | None]] = classify_error,
+    ):
+        """
+        :param name: Name of the provider in logs and metrics.
+        :param rate: Maximum number of calls per second.
+        :param burst: Calls allowed at once after an idle period.
+        :param max_attempts: Attempts of a call, the first one included.
+        :param base_delay: Backoff cap of the first retry in seconds, doubled on every retry.
+        :param max_delay: Maximum backoff cap in seconds.
+        :param max_retry_after: Give up instead of waiting when the provider asks for a longer Retry-After.
+        :param failure_threshold: Consecutive failures opening the circuit.
+        :param reset_timeout: Seconds the circuit stays open before a probe call.
+        :param wait_when_open: Wait for the circuit to close instead of raising
+                               CircuitOpenError, for batch jobs where a late
+                               result beats no result.
+        :param classify: Tells transient failures from the others, like classify_error.
+        """
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.wait_when_open = wait_when_open
+        self.classify = classify
+
+    def _open_circuit_delay(self) -> float:
+        wait = self.breaker.allow()
+        if wait and not self.wait_when_open:
+            metrics.increment("circuit_rejections", provider=self.name)
+            raise CircuitOpenError(self.name, wait)
+        return wait
+
+    def _retry_delay(self, error: Exception, attempt: int, retry_if: Callable[[], bool] | None) -> float | None:
+        """
+        Record a failed attempt.
+
+        :return: Seconds to wait before the next attempt, or None to give up.
+        """
+        retryable, throttled, retry_after = self.classify(error)
+        if throttled:
+            self.bucket.throttled()
+            metrics.increment("provider_throttled", provider=self.name)
+        if not retryable:
+            # The provider answered, the request itself was rejected
+            self.breaker.record_success()
+            return None
+        if self.breaker.record_failure():
+            print(f"Circuit of {self.name} opened after: {error}")
+            metrics.increment("circuit_opened", provider=self.name)
+        if attempt >= self.max_attempts or (retry_if is not None and not retry_if()):
+            return None
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+        if self.breaker.state != CircuitBreaker.CLOSED and not self.wait_when_open:
+            return None
+        metrics.increment("provider_retries", provider=self.name)
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(backoff, retry_after or 0)
+
+    def _succeeded(self) -> None:
+        self.breaker.record_success()
+        self.bucket.succeeded()
+
+    def call(self, fn: Callable, *args, retry_if: Callable[[], bool] | None = None, **kwargs):
+        """
+        Call fn(*args, **kwargs) under the policy, blocking while waiting.
+
+        :param retry_if: Checked before every retry, for calls that can't
+                         always be repeated (like an upload of a consumed stream).
+        :return: The result of fn.
+        :raises CircuitOpenError: If the circuit is open and the policy doesn't wait for it.
+        """
+        attempt = 1
+        while True:
+            while wait := self._open_circuit_delay():
+                time.sleep(wait)
+            time.sleep(self.bucket.reserve())
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, retry_if)
+                if delay is None:
+                    raise
+                print(f"Retrying {self.name} in {delay:.2f}s after: {e}")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self._succeeded()
+            return result
+
+    async def acall(self, fn: Callable[..., Awaitable], *args, retry_if: Callable[[], bool] | None = None, **kwargs):
+        """
+        Async flavour of call, awaiting fn(*args, **kwargs) and waiting without blocking the event loop.
+        """
+        attempt = 1
+        while True:
+            while wait := self._open_circuit_delay():
+                await asyncio.sleep(wait)
+            await asyncio.sleep(self.bucket.reserve())
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, retry_if)
+                if delay is None:
+                    raise
+                print(f"Retrying {self.name} in {delay:.2f}s after: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self._succeeded()
+            return result
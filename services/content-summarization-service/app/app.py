@@ -1,4 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from app.constants.constants import Constants
+from app.services.job_queue import get_job_queue
+from scrollpedia_common.metrics import Metrics, metrics
 from app.services.summarization_service import SummarizationService
 
 app = Flask(__name__)
@@ -18,27 +21,53 @@ def ping():
         'message': 'Pong!'
     })
 
+def collect_metrics() -> Metrics:
+    """
+    Sum the metrics of every web and job worker process of the host, the
+    others as of their last dump and this one as of now.
+    """
+    metrics.dump(Constants.METRICS_DIR)
+    return Metrics.collect(Constants.METRICS_DIR, metrics.namespace)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(collect_metrics().to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics.json', methods=['GET'])
+def metrics_report():
+    return jsonify({
+        'status': 'success',
+        'data': collect_metrics().report()
+    })
+
+def get_article_data(reqBody) -> dict[str, str] | None:
+    """
+    Pick the article fields out of a request body, None if any is missing.
+    """
+    if not isinstance(reqBody, dict) or not reqBody.get('article_id') or not reqBody.get('article_title') or not reqBody.get('article_description'):
+        return None
+    return {
+        'article_id': reqBody.get('article_id'),
+        'article_title': reqBody.get('article_title'),
+        'article_description': reqBody.get('article_description')
+    }
+
 @app.route('/summarize', methods=['POST'])
 def summarize():
     reqBody = request.get_json()
     print("reqBody", reqBody)
-    if not reqBody or not reqBody.get('article_id') or not reqBody.get('article_title') or not reqBody.get('article_description'):
+    article_data = get_article_data(reqBody)
+    if article_data is None:
         return jsonify({
             'status': 'error',
             'message': 'Invalid request',
             'error': 'Missing required fields'
         }), 400
 
-    article_id = reqBody.get('article_id')
-    article_title = reqBody.get('article_title')
-    article_description = reqBody.get('article_description')
+    article_id = article_data['article_id']
     # Here you would call your summarization logic and return the result
     # For now, let's just return the received data as a placeholder
-    audio_file_data = SummarizationService().summarize(article_data={
-        'article_id': article_id,
-        'article_title': article_title,
-        'article_description': article_description
-    })
+    audio_file_data = SummarizationService().summarize(article_data=article_data)
     if audio_file_data is None:
         return jsonify({
             'status': 'error',
@@ -62,6 +91,99 @@ def summarize():
             'error': 'Failed to generate summary'
         }), 500
 
+def get_articles_data(reqBody) -> tuple[list[dict[str, str]] | None, str | None]:
+    """
+    Pick the articles out of a batch request body.
+
+    :return: The articles data, or None and the reason the body is invalid.
+    """
+    articles = reqBody.get('articles') if isinstance(reqBody, dict) else None
+    if not isinstance(articles, list) or not articles:
+        return None, 'Missing required fields'
+    if len(articles) > Constants.SUMMARIZE_BATCH_MAX_ARTICLES:
+        return None, f'At most {Constants.SUMMARIZE_BATCH_MAX_ARTICLES} articles per batch'
+    articles_data = [get_article_data(article) for article in articles]
+    if any(article_data is None for article_data in articles_data):
+        return None, 'Missing required fields'
+    return articles_data, None
+
+@app.route('/summarize/batch', methods=['POST'])
+async def summarize_batch():
+    articles_data, error = get_articles_data(request.get_json())
+    if articles_data is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid request',
+            'error': error
+        }), 400
+
+    # Every article is summarized concurrently, a failed one doesn't fail the batch
+    audio_files_data = await SummarizationService().summarize_many(articles_data)
+    return jsonify({
+        'status': 'success',
+        'message': 'Batch summarization completed',
+        'data': [
+            {
+                'article_id': article_data['article_id'],
+                'audio_data': audio_file_data
+            }
+            for article_data, audio_file_data in zip(articles_data, audio_files_data)
+        ]
+    })
+
+
+@app.route('/summarize/jobs', methods=['POST'])
+def enqueue_summarize_jobs():
+    # The jobs are run by the worker processes, see worker.py
+    articles_data, error = get_articles_data(request.get_json())
+    if articles_data is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid request',
+            'error': error
+        }), 400
+
+    jobs = get_job_queue().enqueue_many(articles_data)
+    return jsonify({
+        'status': 'success',
+        'message': 'Summarization jobs queued',
+        'data': jobs
+    }), 202
+
+@app.route('/summarize/jobs', methods=['GET'])
+def get_summarize_jobs():
+    # Comma separated ids, jobs that don't exist (anymore) are left out
+    job_ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id]
+    if not job_ids or len(job_ids) > Constants.SUMMARIZE_BATCH_MAX_ARTICLES:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid request',
+            'error': f'Between 1 and {Constants.SUMMARIZE_BATCH_MAX_ARTICLES} job ids expected'
+        }), 400
+
+    jobs = get_job_queue().get_many(job_ids)
+    return jsonify({
+        'status': 'success',
+        'message': 'Summarization jobs found',
+        'data': [jobs[job_id] for job_id in job_ids if job_id in jobs]
+    })
+
+@app.route('/summarize/jobs/<job_id>', methods=['GET'])
+def get_summarize_job(job_id):
+    job = get_job_queue().get_many([job_id]).get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Job not found',
+            'error': f'No job with id {job_id}'
+        }), 404
+
+    return jsonify({
+        'status': 'success',
+        'message': 'Summarization job found',
+        'data': job
+    })
+
 
 # main driver function
 if __name__ == '__main__':
@@ -10,4 +10,56 @@ class Constants:
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_KEY')
     REGION_NAME = os.getenv('REGION_NAME', 'us-west-2')  # Default to 'us-west-2' if not set
     GROQ_KEY = os.getenv('GROQ_KEY')
-    CLOUDINARY_CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME')
\ No newline at end of file
+    CLOUDINARY_CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME')
+    # Connections kept alive per provider host by the shared clients
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+    # Bytes read from Polly per chunk of a streamed Cloudinary upload
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(64 * 1024)))
+    # Maximum number of concurrent calls to each provider, shared by every request of the process
+    LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))
+    TTS_CONCURRENCY = int(os.getenv('TTS_CONCURRENCY', '4'))
+    UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '4'))
+    # Summarization results cache, shared by the worker processes of a host
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', 'instance/result_cache.sqlite3')
+    RESULT_CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL_SECONDS', str(30 * 24 * 60 * 60)))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000'))
+    # Seconds a process has to compute a result the others wait for, and between their polls
+    RESULT_CACHE_LEASE_SECONDS = float(os.getenv('RESULT_CACHE_LEASE_SECONDS', '300'))
+    RESULT_CACHE_POLL_INTERVAL = float(os.getenv('RESULT_CACHE_POLL_INTERVAL', '0.5'))
+    # Maximum number of articles accepted by a single /summarize/batch request
+    SUMMARIZE_BATCH_MAX_ARTICLES = int(os.getenv('SUMMARIZE_BATCH_MAX_ARTICLES', '100'))
+    # Calls per second to each provider, lowered on the fly when it throttles
+    LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', '10'))
+    TTS_RATE_LIMIT = float(os.getenv('TTS_RATE_LIMIT', '20'))
+    UPLOAD_RATE_LIMIT = float(os.getenv('UPLOAD_RATE_LIMIT', '10'))
+    # Attempts of a provider call, and the longest Retry-After worth waiting for in seconds
+    PROVIDER_MAX_ATTEMPTS = int(os.getenv('PROVIDER_MAX_ATTEMPTS', '3'))
+    PROVIDER_MAX_RETRY_AFTER = float(os.getenv('PROVIDER_MAX_RETRY_AFTER', '20'))
+    # Consecutive failures opening a provider's circuit, and seconds before it is probed again
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+    # Timeouts of the provider calls in seconds
+    CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', '5'))
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+    TTS_TIMEOUT = float(os.getenv('TTS_TIMEOUT', '30'))
+    UPLOAD_TIMEOUT = float(os.getenv('UPLOAD_TIMEOUT', '60'))
+    # Durable queue of the /summarize/jobs jobs, shared by the web and worker processes of a host
+    JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', 'instance/job_queue.sqlite3')
+    # Worker threads of a worker process, and jobs each of them summarizes at once
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_BATCH_SIZE = int(os.getenv('JOB_BATCH_SIZE', '8'))
+    # Seconds between polls of an empty queue
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+    # Seconds a worker has to finish a job before it is handed to another one
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '600'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    # Seconds before the first retry of a failed job, doubled at every attempt up to the max
+    JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '30'))
+    JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', '600'))
+    # Seconds finished jobs can still be read
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 60 * 60)))
+    # Directory where the web and worker processes of a host dump their metrics for /metrics to sum,
+    # and seconds between two dumps of a process
+    METRICS_DIR = os.getenv('METRICS_DIR', 'instance/metrics')
+    METRICS_DUMP_INTERVAL = float(os.getenv('METRICS_DUMP_INTERVAL', '10'))
+
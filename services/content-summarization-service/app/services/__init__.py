@@ -0,0 +1,4 @@
+from scrollpedia_common.metrics import metrics
+
+# Every service process exports its metrics under this prefix
+metrics.namespace = "scrollpedia_summarization"
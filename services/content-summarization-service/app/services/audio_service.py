@@ -1,15 +1,12 @@
-import boto3
 import random
 from app.constants.constants import Constants
+from app.services.clients import get_polly_client, tts_policy
+from scrollpedia_common.metrics import metrics
 
 
 class AudioService:
     def __init__(self, region_name='us-west-2'):
-        self.polly_client = boto3.Session(
-            aws_access_key_id=Constants.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=Constants.AWS_SECRET_ACCESS_KEY,
-            region_name=region_name
-        ).client('polly')
+        self.polly_client = get_polly_client(region_name)
         self.voice_ids = [
             "Joanna", "Salli", "Kimberly", "Kendra", "Ivy", 
             "Gregory", "Kevin", "Matthew", "Justin", "Joey"
@@ -32,18 +29,21 @@ class AudioService:
             voice_id = random.choice(self.voice_ids)
 
         try:
-            response = self.polly_client.synthesize_speech(
-                VoiceId=voice_id,
-                OutputFormat=output_format,
-                Text=text,
-                Engine=engine,
-                LanguageCode=language_code,
-                TextType='text',
-                SampleRate=sample_rate
-            )
+            with metrics.span("tts_request", engine=engine):
+                response = tts_policy.call(
+                    self.polly_client.synthesize_speech,
+                    VoiceId=voice_id,
+                    OutputFormat=output_format,
+                    Text=text,
+                    Engine=engine,
+                    LanguageCode=language_code,
+                    TextType='text',
+                    SampleRate=sample_rate
+                )
             return response["AudioStream"]
         except Exception as e:
             print(f"Error synthesizing speech: {e}")
+            metrics.increment("summaries_failed", step="tts")
             return None
 
 
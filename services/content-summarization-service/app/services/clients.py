@@ -0,0 +1,99 @@
+import threading
+import boto3
+import requests
+from botocore.config import Config
+from groq import Groq
+from requests.adapters import HTTPAdapter
+from app.constants.constants import Constants
+from scrollpedia_common.resilience import ProviderPolicy
+
+# Process-wide provider clients, built on first use and shared by every
+# request so TLS connections and botocore setup are paid once per process.
+# All of them are safe to share between threads.
+_lock = threading.Lock()
+_groq_client = None
+_polly_clients = {}
+_http_session = None
+
+
+def create_policy(name: str, rate: float) -> ProviderPolicy:
+    return ProviderPolicy(
+        name,
+        rate=rate,
+        max_attempts=Constants.PROVIDER_MAX_ATTEMPTS,
+        max_delay=10,
+        max_retry_after=Constants.PROVIDER_MAX_RETRY_AFTER,
+        failure_threshold=Constants.CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=Constants.CIRCUIT_RESET_SECONDS
+    )
+
+
+# Process-wide rate limits, retries and circuit breakers of the providers.
+# Requests fail fast while a circuit is open.
+llm_policy = create_policy("groq", Constants.LLM_RATE_LIMIT)
+tts_policy = create_policy("polly", Constants.TTS_RATE_LIMIT)
+upload_policy = create_policy("cloudinary", Constants.UPLOAD_RATE_LIMIT)
+
+
+# Retries are left to the policies, so the clients' own are turned off
+def create_groq_client() -> Groq:
+    return Groq(api_key=Constants.GROQ_KEY, timeout=Constants.LLM_TIMEOUT, max_retries=0)
+
+
+def create_polly_client(region_name: str):
+    return boto3.Session(
+        aws_access_key_id=Constants.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=Constants.AWS_SECRET_ACCESS_KEY,
+        region_name=region_name
+    ).client('polly', config=Config(
+        max_pool_connections=Constants.HTTP_POOL_SIZE,
+        connect_timeout=Constants.CONNECT_TIMEOUT,
+        read_timeout=Constants.TTS_TIMEOUT,
+        retries={"mode": "standard", "total_max_attempts": 1}
+    ))
+
+
+def create_http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=Constants.HTTP_POOL_SIZE, pool_maxsize=Constants.HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_groq_client() -> Groq:
+    """
+    Get the process-wide Groq client.
+    """
+    global _groq_client
+    if _groq_client is None:
+        with _lock:
+            if _groq_client is None:
+                _groq_client = create_groq_client()
+    return _groq_client
+
+
+def get_polly_client(region_name: str = None):
+    """
+    Get the process-wide Polly client of a region.
+
+    :param region_name: The AWS region, defaults to Constants.REGION_NAME.
+    """
+    region_name = region_name or Constants.REGION_NAME
+    if region_name not in _polly_clients:
+        with _lock:
+            if region_name not in _polly_clients:
+                _polly_clients[region_name] = create_polly_client(region_name)
+    return _polly_clients[region_name]
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the process-wide keep-alive HTTP session used for plain HTTP providers like Cloudinary.
+    """
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                _http_session = create_http_session()
+    return _http_session
@@ -1,30 +1,68 @@
-import os
-import requests
-from typing import BinaryIO
+import time
+import uuid
+from typing import BinaryIO, Iterator
 from app.constants.constants import Constants
+from app.services.clients import get_http_session, upload_policy
+from scrollpedia_common.metrics import metrics
+
+
+class UploadStats:
+    """Byte count and timings of one streamed upload."""
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.started_at = time.perf_counter()
+        self.first_chunk_ms = None
+        self.stream_ms = None
+        self.total_ms = None
+
+    def __str__(self) -> str:
+        return (
+            f"{self.bytes_sent} bytes, first audio chunk after {self.first_chunk_ms or 0:.1f} ms, "
+            f"body streamed in {self.stream_ms or 0:.1f} ms, upload took {self.total_ms or 0:.1f} ms"
+        )
+
 
 class CloudinaryService:
     ROOT_ASSETS_PATH = "summary_audio_files"
 
     def __init__(self):
         self.CLOUD_NAME = Constants.CLOUDINARY_CLOUD_NAME
+        self.session = get_http_session()
 
-    def upload_audio_stream(self, audio_stream: BinaryIO) -> dict:
+    def upload_audio_stream(self, audio_stream: BinaryIO, filename: str = "summary.mp3", content_type: str = "audio/mpeg") -> dict:
         """
         Uploads an MP3/WAV audio stream to Cloudinary.
 
+        The stream is piped into a chunked multipart request as it is read, so
+        the audio is never held in memory as a whole.
+
         :param audio_stream: The audio stream to upload.
+        :param filename: The file name sent in the multipart body.
+        :param content_type: The content type of the audio.
         :return: The response from Cloudinary.
         """
+        stats = UploadStats()
         try:
-            files = {"file": audio_stream}
+            boundary = uuid.uuid4().hex
             data = {"upload_preset": "ml_default", "resource_type": "audio"}
-            response = requests.post(
-                f"https://api.cloudinary.com/v1_1/{self.CLOUD_NAME}/auto/upload",
-                files=files,
-                data=data,
-            )
-            print(f"Cloudinary upload response: {response.status_code} {response.text} {response.json()}")
+            with metrics.span("upload_request"):
+                # The audio can only be streamed once, an upload is only
+                # retried when it failed before any of it was sent
+                response = upload_policy.call(
+                    self._post,
+                    boundary,
+                    data,
+                    audio_stream,
+                    filename,
+                    content_type,
+                    stats,
+                    retry_if=lambda: stats.bytes_sent == 0
+                )
+            stats.total_ms = (time.perf_counter() - stats.started_at) * 1000
+            metrics.increment("uploaded_bytes", stats.bytes_sent)
+            print(f"Cloudinary upload response: {response.status_code} {response.text}")
+            print(f"Cloudinary upload stats: {stats}")
             respJson = response.json()
             if not respJson.get("secure_url"):
                 raise Exception("Invalid response from Cloudinary")
@@ -38,4 +76,61 @@ class CloudinaryService:
             }
         except Exception as e:
             print(f"Error uploading audio stream: {e}")
+            metrics.increment("summaries_failed", step="upload")
             return None
+        finally:
+            if hasattr(audio_stream, "close"):
+                audio_stream.close()
+
+    def _post(
+        self,
+        boundary: str,
+        fields: dict[str, str],
+        audio_stream: BinaryIO,
+        filename: str,
+        content_type: str,
+        stats: UploadStats,
+    ):
+        response = self.session.post(
+            f"https://api.cloudinary.com/v1_1/{self.CLOUD_NAME}/auto/upload",
+            data=self._multipart_body(boundary, fields, audio_stream, filename, content_type, stats),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=(Constants.CONNECT_TIMEOUT, Constants.UPLOAD_TIMEOUT),
+        )
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _multipart_body(
+        boundary: str,
+        fields: dict[str, str],
+        audio_stream: BinaryIO,
+        filename: str,
+        content_type: str,
+        stats: UploadStats,
+    ) -> Iterator[bytes]:
+        """
+        Yield a multipart/form-data body chunk by chunk, reading the audio
+        stream only as the request is sent.
+        """
+        for name, value in fields.items():
+            yield (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode("utf-8")
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        while True:
+            chunk = audio_stream.read(Constants.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if stats.first_chunk_ms is None:
+                stats.first_chunk_ms = (time.perf_counter() - stats.started_at) * 1000
+            stats.bytes_sent += len(chunk)
+            yield chunk
+        stats.stream_ms = (time.perf_counter() - stats.started_at) * 1000
+        yield f"\r\n--{boundary}--\r\n".encode("utf-8")
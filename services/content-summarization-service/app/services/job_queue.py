@@ -0,0 +1,248 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from app.constants.constants import Constants
+from scrollpedia_common.metrics import metrics
+from app.services.result_cache import ResultCache
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Durable queue of summarization jobs backed by SQLite.
+
+    The web processes enqueue jobs and read their state, the worker
+    processes claim and run them, all through the same database file. A
+    claimed job is leased for lease_seconds: a job whose worker died is
+    claimed again once its lease expired, and every claim gets a new token:
+    the worker whose lease expired can't complete or fail the job any more.
+    Failed jobs are retried up to
+    max_attempts times, after retry_base_seconds doubled at every attempt
+    (up to retry_max_seconds), so a provider outage isn't hammered by its
+    own retries. Finished jobs are deleted after retention seconds.
+
+    An article that already has a queued or running job gets that job back
+    instead of a new one, so a retried submission doesn't summarize it twice.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float,
+        max_attempts: int,
+        retention: float,
+        retry_base_seconds: float = 30,
+        retry_max_seconds: float = 600,
+    ):
+        """
+        :param path: Path of the SQLite database file, created if missing.
+        :param lease_seconds: Seconds a worker has to finish a job it claimed.
+        :param max_attempts: Attempts of a job, the first one included.
+        :param retention: Seconds finished jobs can still be read.
+        :param retry_base_seconds: Seconds before the first retry of a failed job.
+        :param retry_max_seconds: Longest wait before a retry.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._lock = threading.Lock()
+        # Transactions are opened explicitly, so a claim locks the database against the other processes
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, key TEXT NOT NULL, article_data TEXT NOT NULL, status TEXT NOT NULL, "
+            "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL, "
+            "not_before REAL NOT NULL DEFAULT 0, claim_token TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        # Queues created before retries were delayed and claims had a token
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        for column, definition in (("not_before", "REAL NOT NULL DEFAULT 0"), ("claim_token", "TEXT")):
+            if column not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError:
+                    # Added by another process in the meantime
+                    pass
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+
+    def _transaction(self, fn, *args):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job_id, article_data, status, result, error, attempts = row
+        return {
+            "job_id": job_id,
+            "article_id": json.loads(article_data)["article_id"],
+            "status": status,
+            "audio_data": json.loads(result) if result else None,
+            "error": error,
+            "attempts": attempts,
+        }
+
+    def enqueue_many(self, articles_data: list[dict[str, str]]) -> list[dict]:
+        """
+        Add a job for every article, or reuse its pending one.
+
+        :return: The jobs, in the order of the articles.
+        """
+        def enqueue() -> list[dict]:
+            now = time.time()
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at <= ?",
+                (DONE, FAILED, now - self.retention),
+            )
+            jobs = []
+            for article_data in articles_data:
+                key = ResultCache.make_key(article_data)
+                row = self._conn.execute(
+                    "SELECT id, article_data, status, result, error, attempts FROM jobs "
+                    "WHERE key = ? AND status IN (?, ?) LIMIT 1",
+                    (key, QUEUED, RUNNING),
+                ).fetchone()
+                if row is None:
+                    row = (uuid.uuid4().hex, json.dumps(article_data), QUEUED, None, None, 0)
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, key, article_data, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (row[0], key, row[1], QUEUED, now, now),
+                    )
+                    metrics.increment("jobs", outcome="enqueued")
+                jobs.append(self._to_dict(row))
+            return jobs
+
+        return self._transaction(enqueue)
+
+    def get_many(self, job_ids: list[str]) -> dict[str, dict]:
+        """
+        :return: The jobs found, keyed by id.
+        """
+        if not job_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, article_data, status, result, error, attempts FROM jobs WHERE id IN ({','.join('?' * len(job_ids))})",
+                job_ids,
+            ).fetchall()
+        return {row[0]: self._to_dict(row) for row in rows}
+
+    def claim(self, limit: int) -> list[tuple[str, str, dict[str, str]]]:
+        """
+        Lease up to limit jobs, the oldest queued ones due for a try and the ones whose lease expired.
+
+        :return: The ids, claim tokens and article data of the claimed jobs.
+        """
+        def claim() -> list[tuple[str, str, dict[str, str]]]:
+            now = time.time()
+            # A worker died on these ones, and they have no attempt left
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, claim_token = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "Lease expired", now, RUNNING, now, self.max_attempts),
+            )
+            rows = self._conn.execute(
+                "SELECT id, article_data FROM jobs "
+                "WHERE (status = ? AND not_before <= ?) OR (status = ? AND lease_until < ?) ORDER BY created_at LIMIT ?",
+                (QUEUED, now, RUNNING, now, limit),
+            ).fetchall()
+            claims = [(job_id, uuid.uuid4().hex, json.loads(article_data)) for job_id, article_data in rows]
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, claim_token = ?, updated_at = ? WHERE id = ?",
+                [(RUNNING, now + self.lease_seconds, token, now, job_id) for job_id, token, _ in claims],
+            )
+            return claims
+
+        return self._transaction(claim)
+
+    def complete(self, job_id: str, claim_token: str, result: dict) -> bool:
+        """
+        Store the result of a job, unless the claim is not the job's current one any more.
+
+        :return: Whether the job was completed.
+        """
+        with self._lock:
+            completed = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_until = NULL, claim_token = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND claim_token = ?",
+                (DONE, json.dumps(result), time.time(), job_id, RUNNING, claim_token),
+            ).rowcount == 1
+        metrics.increment("jobs", outcome="done" if completed else "stale")
+        return completed
+
+    def fail(self, job_id: str, claim_token: str, error: str) -> bool:
+        """
+        Queue a failed job again once its backoff elapsed, or mark it failed
+        once it used all its attempts. Nothing happens when the claim is not
+        the job's current one any more, or the job was deleted.
+
+        :return: Whether the job was failed.
+        """
+        def fail() -> str | None:
+            row = self._conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND status = ? AND claim_token = ?",
+                (job_id, RUNNING, claim_token),
+            ).fetchone()
+            if row is None:
+                return None
+            (attempts,) = row
+            status = QUEUED if attempts < self.max_attempts else FAILED
+            now = time.time()
+            delay = min(self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, claim_token = NULL, not_before = ?, updated_at = ? "
+                "WHERE id = ?",
+                (status, error, now + delay, now, job_id),
+            )
+            return status
+
+        status = self._transaction(fail)
+        metrics.increment("jobs", outcome={QUEUED: "retried", FAILED: "failed", None: "stale"}[status])
+        return status is not None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_lock = threading.Lock()
+_job_queue = None
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Get the process-wide job queue, configured through Constants.
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(
+                    Constants.JOB_QUEUE_PATH,
+                    lease_seconds=Constants.JOB_LEASE_SECONDS,
+                    max_attempts=Constants.JOB_MAX_ATTEMPTS,
+                    retention=Constants.JOB_RETENTION_SECONDS,
+                    retry_base_seconds=Constants.JOB_RETRY_BASE_SECONDS,
+                    retry_max_seconds=Constants.JOB_RETRY_MAX_SECONDS
+                )
+    return _job_queue
@@ -0,0 +1,57 @@
+import asyncio
+import signal
+import threading
+from app.constants.constants import Constants
+from app.services.job_queue import get_job_queue
+from scrollpedia_common.metrics import metrics
+from app.services.summarization_service import SummarizationService
+
+
+def work(stop: threading.Event) -> None:
+    """
+    Claim and summarize batches of JOB_BATCH_SIZE jobs until stop is set,
+    polling the queue every JOB_POLL_INTERVAL seconds while it is empty.
+    """
+    job_queue = get_job_queue()
+    service = SummarizationService()
+    while not stop.is_set():
+        jobs = job_queue.claim(Constants.JOB_BATCH_SIZE)
+        if not jobs:
+            stop.wait(Constants.JOB_POLL_INTERVAL)
+            continue
+        try:
+            # The articles of a batch are summarized concurrently, within the provider caps
+            with metrics.span("job_batch"):
+                results = asyncio.run(service.summarize_many([article_data for _, _, article_data in jobs]))
+        except Exception as e:
+            print(f"Error summarizing batch of {len(jobs)} jobs: {e}")
+            for job_id, claim_token, _ in jobs:
+                job_queue.fail(job_id, claim_token, str(e))
+            continue
+        # A job whose lease expired meanwhile belongs to another worker, these calls leave it alone
+        for (job_id, claim_token, _), result in zip(jobs, results):
+            if result:
+                job_queue.complete(job_id, claim_token, result)
+            else:
+                job_queue.fail(job_id, claim_token, "Failed to generate summary")
+
+
+def run_workers(count: int = Constants.JOB_WORKERS) -> None:
+    """
+    Run count worker threads until the process gets SIGINT or SIGTERM, then
+    let them finish their current batch.
+    """
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    threads = [threading.Thread(target=work, args=(stop,), name=f"job-worker-{i}") for i in range(count)]
+    for thread in threads:
+        thread.start()
+    # Exported by the /metrics endpoint of the web processes, next to their own metrics
+    stop_dumping = metrics.dump_periodically(Constants.METRICS_DIR, Constants.METRICS_DUMP_INTERVAL)
+    print(f"Job workers started, count: {count}")
+    for thread in threads:
+        thread.join()
+    stop_dumping.set()
+    metrics.dump(Constants.METRICS_DIR)
+    print("Job workers stopped, metrics:", metrics.to_json())
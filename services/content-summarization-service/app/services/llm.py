@@ -1,20 +1,23 @@
-from groq import Groq
-from app.constants.constants import Constants
+from app.services.clients import get_groq_client, llm_policy
+from scrollpedia_common.metrics import metrics
 
 class LLM:
     def __init__(self):
-        self.client = Groq(api_key=Constants.GROQ_KEY)
+        self.client = get_groq_client()
 
     def text_summary(self, content: str) -> str:
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are an intelligent summarizer for having mastery in beautifully summarizing wikipedia articles in less than 250 characters."},
-                    {"role": "user", "content": "Here's article title {} and description {}. Summarize it in less than 250 characters.".format(content['article_title'], content['article_description'])},
-                ],
-                model="llama-3.3-70b-versatile",
-            )
+            with metrics.span("llm_request"):
+                chat_completion = llm_policy.call(
+                    self.client.chat.completions.create,
+                    messages=[
+                        {"role": "system", "content": "You are an intelligent summarizer for having mastery in beautifully summarizing wikipedia articles in less than 250 characters."},
+                        {"role": "user", "content": "Here's article title {} and description {}. Summarize it in less than 250 characters.".format(content['article_title'], content['article_description'])},
+                    ],
+                    model="llama-3.3-70b-versatile",
+                )
             return chat_completion.choices[0].message.content
         except Exception as e:
             print(f"Error in text_summary: {e}")
+            metrics.increment("summaries_failed", step="llm")
             return None
\ No newline at end of file
@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Awaitable, Callable
+from app.constants.constants import Constants
+from scrollpedia_common.metrics import metrics
+
+
+class ResultCache:
+    """
+    Persistent cache of summarization results with request coalescing.
+
+    Results are keyed by article_id plus a hash of the title and description,
+    so an edited article is summarized again. Entries expire after ttl
+    seconds and at most max_entries are kept, the least recently used ones
+    are evicted first. Failed summaries are never cached.
+
+    Concurrent requests for the same key are coalesced: the first one does
+    the work and the others wait for its result. Within a process they wait
+    on a future, across the processes sharing the file the first one leases
+    the key in the claims table and the others poll for the result. A lease
+    left by a process that died expires after lease_seconds, a failed
+    computation releases it so the next waiter takes over.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int, lease_seconds: float = 300, poll_interval: float = 0.5):
+        """
+        :param path: Path of the SQLite database file, created if missing.
+        :param ttl: Seconds a result stays valid.
+        :param max_entries: Maximum number of results kept on disk.
+        :param lease_seconds: Seconds a process has to compute a result the others wait for.
+        :param poll_interval: Seconds between two polls of a result computed by another process.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        # Owner of the leases taken by this cache
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        # Shared by the request threads, and with the other worker processes through the file
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # Readers polling for a result don't block the process storing it
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, article_id TEXT NOT NULL, result TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, owner TEXT NOT NULL, lease_until REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(article_data: dict[str, str]) -> str:
+        content = f"{article_data['article_title']}\0{article_data['article_description']}"
+        return f"{article_data['article_id']}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM results WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, article_id, result, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, key.split(":", 1)[0], json.dumps(result), now, now),
+            )
+            self._conn.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def _claim(self, key: str) -> tuple[Future, bool]:
+        """
+        Get the future of the in-flight computation of key, registering a new
+        one if there is none.
+
+        :return: The future and whether the caller owns it and has to compute the result.
+        """
+        with self._lock:
+            if key in self._in_flight:
+                return self._in_flight[key], False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _try_lease(self, key: str) -> tuple[dict | None, bool]:
+        """
+        Lease key against the other processes, unless one of them holds it or its result is stored by now.
+
+        :return: The stored result if there is one, and whether the lease was taken.
+        """
+        now = time.time()
+        with self._lock:
+            # The writes lock the file, no other process can store the result or lease the key in between
+            self._conn.execute("DELETE FROM claims WHERE key = ? AND lease_until <= ?", (key, now))
+            leased = self._conn.execute(
+                "INSERT OR IGNORE INTO claims (key, owner, lease_until) VALUES (?, ?, ?)",
+                (key, self._owner, now + self.lease_seconds),
+            ).rowcount == 1
+            row = self._conn.execute(
+                "SELECT result FROM results WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("DELETE FROM claims WHERE key = ? AND owner = ?", (key, self._owner))
+                self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        if row is not None:
+            return json.loads(row[0]), False
+        return None, leased
+
+    def _lease(self, key: str) -> dict | None:
+        """
+        Wait until key is leased by this process, or its result was stored by another one.
+
+        :return: The stored result, None once the key is leased.
+        """
+        while True:
+            result, leased = self._try_lease(key)
+            if result is not None or leased:
+                return result
+            time.sleep(self.poll_interval)
+
+    async def _alease(self, key: str) -> dict | None:
+        while True:
+            result, leased = await asyncio.to_thread(self._try_lease, key)
+            if result is not None or leased:
+                return result
+            await asyncio.sleep(self.poll_interval)
+
+    def _resolve(
+        self,
+        key: str,
+        future: Future,
+        result: dict | None = None,
+        error: BaseException | None = None,
+        store: bool = True,
+    ) -> None:
+        """
+        Store the result of key, then release it and hand the outcome to the
+        waiting callers, even when storing or releasing fails: the waiters
+        still get the result, and a lease left behind expires.
+        """
+        try:
+            if result is not None and store:
+                self.put(key, result)
+        finally:
+            try:
+                with self._lock:
+                    self._conn.execute("DELETE FROM claims WHERE key = ? AND owner = ?", (key, self._owner))
+                    self._conn.commit()
+            finally:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def get_or_compute(self, article_data: dict[str, str], compute: Callable[[], dict | None]) -> dict | None:
+        """
+        Get the cached result of an article, or compute it once for all concurrent callers.
+        """
+        key = self.make_key(article_data)
+        result = self.get(key)
+        if result is not None:
+            metrics.increment("result_cache", outcome="hit")
+            return result
+        future, owner = self._claim(key)
+        if not owner:
+            metrics.increment("result_cache", outcome="coalesced")
+            return future.result()
+        try:
+            result = self._lease(key)
+            if result is not None:
+                metrics.increment("result_cache", outcome="coalesced_across_processes")
+                self._resolve(key, future, result, store=False)
+                return result
+            metrics.increment("result_cache", outcome="miss")
+            result = compute()
+        except BaseException as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, result)
+        return result
+
+    async def aget_or_compute(self, article_data: dict[str, str], compute: Callable[[], Awaitable[dict | None]]) -> dict | None:
+        """
+        Async flavour of get_or_compute, waiting for other callers without blocking the event loop.
+        """
+        key = self.make_key(article_data)
+        result = await asyncio.to_thread(self.get, key)
+        if result is not None:
+            metrics.increment("result_cache", outcome="hit")
+            return result
+        future, owner = self._claim(key)
+        if not owner:
+            metrics.increment("result_cache", outcome="coalesced")
+            return await asyncio.wrap_future(future)
+        try:
+            result = await self._alease(key)
+            if result is not None:
+                metrics.increment("result_cache", outcome="coalesced_across_processes")
+                await asyncio.to_thread(self._resolve, key, future, result, store=False)
+                return result
+            metrics.increment("result_cache", outcome="miss")
+            result = await compute()
+        except BaseException as e:
+            await asyncio.to_thread(self._resolve, key, future, error=e)
+            raise
+        await asyncio.to_thread(self._resolve, key, future, result)
+        return result
+
+
+_lock = threading.Lock()
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Get the process-wide result cache, configured through Constants.
+    """
+    global _result_cache
+    if _result_cache is None:
+        with _lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    Constants.RESULT_CACHE_PATH,
+                    ttl=Constants.RESULT_CACHE_TTL_SECONDS,
+                    max_entries=Constants.RESULT_CACHE_MAX_ENTRIES,
+                    lease_seconds=Constants.RESULT_CACHE_LEASE_SECONDS,
+                    poll_interval=Constants.RESULT_CACHE_POLL_INTERVAL
+                )
+    return _result_cache
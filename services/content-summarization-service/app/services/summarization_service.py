@@ -1,30 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from app.constants.constants import Constants
 from app.services.llm import LLM
 from app.services.audio_service import AudioService
 from app.services.cloudinary_service import CloudinaryService
+from app.services.result_cache import get_result_cache
+
+
+def _limited(limit: threading.BoundedSemaphore, fn, *args, **kwargs):
+    """
+    Call fn while holding one of the limit's slots.
+    """
+    with limit:
+        return fn(*args, **kwargs)
+
 
 class SummarizationService:
+    # Caps on concurrent calls to each provider, shared by every request of the process
+    llm_limit = threading.BoundedSemaphore(Constants.LLM_CONCURRENCY)
+    tts_limit = threading.BoundedSemaphore(Constants.TTS_CONCURRENCY)
+    upload_limit = threading.BoundedSemaphore(Constants.UPLOAD_CONCURRENCY)
+    # The provider clients are blocking, batches run the calls of each provider
+    # on threads of its own, as many as its cap, so calls waiting for a slot of
+    # one provider never hold the threads of the others
+    llm_executor = ThreadPoolExecutor(max_workers=Constants.LLM_CONCURRENCY, thread_name_prefix="summarize-llm")
+    tts_executor = ThreadPoolExecutor(max_workers=Constants.TTS_CONCURRENCY, thread_name_prefix="summarize-tts")
+    upload_executor = ThreadPoolExecutor(max_workers=Constants.UPLOAD_CONCURRENCY, thread_name_prefix="summarize-upload")
 
     def summarize(self, article_data: dict[str, str]) -> dict:
         """
             This method returns the audio summary file link as output.
+
+            Results are cached per article and content, and concurrent requests
+            for the same article share a single summarization.
             :param text: The text to summarize.
         """
+        return get_result_cache().get_or_compute(article_data, lambda: self._summarize(article_data))
+
+    def _summarize(self, article_data: dict[str, str]) -> dict:
         # get summarization from the model
-        text_summary = LLM().text_summary(article_data)
+        text_summary = _limited(self.llm_limit, LLM().text_summary, article_data)
         if  text_summary is None:
             return None
         # give it to audio model
         # get audio file link from audio model
-        audio_stream = AudioService().synthesize_speech(
-            text=text_summary
-        )
+        audio_stream = _limited(self.tts_limit, AudioService().synthesize_speech, text=text_summary)
         if not audio_stream:
             return None
         # upload audio stream to cloudinary
-        audio_file_link = CloudinaryService().upload_audio_stream(audio_stream)
+        audio_file_link = _limited(self.upload_limit, CloudinaryService().upload_audio_stream, audio_stream)
         return audio_file_link
-        
+
+    async def summarize_many(self, articles_data: list[dict[str, str]]) -> list[dict | None]:
+        """
+            This method returns the audio summary file link of every article, in order.
+
+            The LLM, TTS and upload steps of all the articles run concurrently,
+            within the per-provider caps, so one article can be synthesized
+            while the next one is still being summarized. Cached articles are
+            served without calling the providers.
+            :param articles_data: The articles to summarize.
+        """
+        llm = LLM()
+        audio_service = AudioService()
+        cloudinary_service = CloudinaryService()
+        loop = asyncio.get_running_loop()
+
+        def run(executor: ThreadPoolExecutor, limit: threading.BoundedSemaphore, fn, *args, **kwargs):
+            # The limit is still taken, it is shared with the calls of summarize
+            return loop.run_in_executor(executor, partial(_limited, limit, fn, *args, **kwargs))
+
+        async def compute_one(article_data: dict[str, str]) -> dict | None:
+            text_summary = await run(self.llm_executor, self.llm_limit, llm.text_summary, article_data)
+            if text_summary is None:
+                return None
+            audio_stream = await run(self.tts_executor, self.tts_limit, audio_service.synthesize_speech, text=text_summary)
+            if not audio_stream:
+                return None
+            return await run(self.upload_executor, self.upload_limit, cloudinary_service.upload_audio_stream, audio_stream)
+
+        async def summarize_one(article_data: dict[str, str]) -> dict | None:
+            return await result_cache.aget_or_compute(article_data, lambda: compute_one(article_data))
+
+        result_cache = get_result_cache()
+        return await asyncio.gather(*(summarize_one(article_data) for article_data in articles_data))
+
 
 if __name__ == "__main__":
     # Example usage:
@@ -33,4 +95,4 @@ if __name__ == "__main__":
     text = '''Instead of hosting custom models, we can use third-party TTS (text-to-speech) service'''
 
     audio_service = AudioService(aws_access_key_id, aws_secret_access_key)
-    audio_service.synthesize_speech(text)
\ No newline at end of file
+    audio_service.synthesize_speech(text)
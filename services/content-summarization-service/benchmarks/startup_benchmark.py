@@ -0,0 +1,72 @@
+"""
+Startup benchmark of the provider clients.
+
+Compares what each provider call costs with a freshly built client (what
+every request paid before the clients were shared) against the shared,
+already warm client. Needs the provider credentials from .env.
+
+Usage, from the service root:
+    python -m benchmarks.startup_benchmark [--requests 5]
+"""
+
+import argparse
+import statistics
+import time
+from app.constants.constants import Constants
+from app.services import clients
+
+
+def time_call(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def benchmark(name: str, create_client, get_client, request, requests: int) -> None:
+    """
+    Print the cold and warm latency of one provider in milliseconds.
+
+    :param create_client: Builds a new client, like every request used to.
+    :param get_client: Returns the shared client.
+    :param request: Sends one cheap request with a client.
+    """
+    cold = [time_call(lambda: request(create_client())) for _ in range(requests)]
+    # The first call on the shared client pays for its setup
+    first = time_call(lambda: request(get_client()))
+    warm = [time_call(lambda: request(get_client())) for _ in range(requests)]
+    print(
+        f"{name:<12} cold p50 {statistics.median(cold):8.1f} ms | "
+        f"shared first {first:8.1f} ms | shared warm p50 {statistics.median(warm):8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5, help="Requests per measurement")
+    args = parser.parse_args()
+
+    benchmark(
+        "groq",
+        clients.create_groq_client,
+        clients.get_groq_client,
+        lambda client: client.models.list(),
+        args.requests,
+    )
+    benchmark(
+        "polly",
+        lambda: clients.create_polly_client(Constants.REGION_NAME),
+        clients.get_polly_client,
+        lambda client: client.describe_voices(LanguageCode="en-IN"),
+        args.requests,
+    )
+    benchmark(
+        "cloudinary",
+        clients.create_http_session,
+        clients.get_http_session,
+        lambda session: session.head(f"https://api.cloudinary.com/v1_1/{Constants.CLOUDINARY_CLOUD_NAME}/auto/upload", timeout=10),
+        args.requests,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for serving the summarization service.
+
+Run with `gunicorn main:app`. Each worker process serves several requests at
+once on its threads, and the provider caps in Constants are shared by every
+thread of a process. The jobs queued through /summarize/jobs are run by
+separate `python worker.py` processes, scaled independently of these.
+
+Every process dumps its metrics to METRICS_DIR, so /metrics reports the sum
+of all of them whichever worker serves the scrape.
+"""
+
+import multiprocessing
+import os
+import shutil
+from app.constants.constants import Constants
+from scrollpedia_common.metrics import metrics
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+# A batch of articles runs several seconds of provider calls
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+keepalive = 5
+
+
+def on_starting(server):
+    # The dumps of a previous run would be summed with the new ones, the counters restart from zero instead
+    shutil.rmtree(Constants.METRICS_DIR, ignore_errors=True)
+
+
+def post_worker_init(worker):
+    metrics.dump_periodically(Constants.METRICS_DIR, Constants.METRICS_DUMP_INTERVAL)
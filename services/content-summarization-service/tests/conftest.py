@@ -0,0 +1,7 @@
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run from anywhere, and without scrollpedia_common installed
+sys.path[:0] = [SERVICE_DIR, os.path.join(os.path.dirname(SERVICE_DIR), "common")]
@@ -0,0 +1,104 @@
+import time
+import pytest
+from app.services.job_queue import JobQueue
+
+
+def make_queue(tmp_path, **kwargs) -> JobQueue:
+    settings = {"lease_seconds": 60, "max_attempts": 3, "retention": 60, "retry_base_seconds": 0, "retry_max_seconds": 0}
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), **{**settings, **kwargs})
+
+
+def make_article(article_id: int) -> dict[str, str]:
+    return {"article_id": str(article_id), "article_title": f"Article {article_id}", "article_description": "Description"}
+
+
+def status(queue: JobQueue, job_id: str) -> str:
+    return queue.get_many([job_id])[job_id]["status"]
+
+
+def test_pending_jobs_are_reused(tmp_path):
+    queue = make_queue(tmp_path)
+    [first] = queue.enqueue_many([make_article(1)])
+    [again, other] = queue.enqueue_many([make_article(1), make_article(2)])
+    assert again["job_id"] == first["job_id"]
+    assert other["job_id"] != first["job_id"]
+
+
+def test_claim_hands_every_job_out_once(tmp_path):
+    queue = make_queue(tmp_path)
+    jobs = queue.enqueue_many([make_article(i) for i in range(3)])
+    claimed = queue.claim(2) + queue.claim(2)
+    assert sorted(job_id for job_id, _, _ in claimed) == sorted(job["job_id"] for job in jobs)
+    assert queue.claim(2) == []
+    assert all(status(queue, job["job_id"]) == "running" for job in jobs)
+
+
+def test_complete_stores_the_result(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue_many([make_article(1)])
+    [(job_id, claim_token, article_data)] = queue.claim(1)
+    assert article_data == make_article(1)
+    assert queue.complete(job_id, claim_token, {"file_url": "url"})
+    job = queue.get_many([job_id])[job_id]
+    assert job["status"] == "done"
+    assert job["audio_data"] == {"file_url": "url"}
+
+
+def test_failed_jobs_are_retried_until_out_of_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    [job] = queue.enqueue_many([make_article(1)])
+    [(job_id, claim_token, _)] = queue.claim(1)
+    assert queue.fail(job_id, claim_token, "boom")
+    assert status(queue, job_id) == "queued"
+    [(_, claim_token, _)] = queue.claim(1)
+    assert queue.fail(job_id, claim_token, "boom again")
+    failed = queue.get_many([job["job_id"]])[job["job_id"]]
+    assert failed["status"] == "failed"
+    assert failed["error"] == "boom again"
+    assert queue.claim(1) == []
+
+
+def test_failed_jobs_wait_for_their_backoff(tmp_path):
+    queue = make_queue(tmp_path, retry_base_seconds=60, retry_max_seconds=60)
+    queue.enqueue_many([make_article(1)])
+    [(job_id, claim_token, _)] = queue.claim(1)
+    queue.fail(job_id, claim_token, "boom")
+    assert queue.claim(1) == []
+    assert status(queue, job_id) == "queued"
+
+
+def test_expired_leases_are_claimed_again(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    queue.enqueue_many([make_article(1)])
+    [(job_id, stale_token, _)] = queue.claim(1)
+    time.sleep(0.1)
+    [(reclaimed_id, claim_token, _)] = queue.claim(1)
+    assert reclaimed_id == job_id
+    assert claim_token != stale_token
+
+    # The worker whose lease expired can't touch the job any more
+    assert not queue.complete(job_id, stale_token, {"file_url": "stale"})
+    assert not queue.fail(job_id, stale_token, "stale")
+    assert status(queue, job_id) == "running"
+    assert queue.complete(job_id, claim_token, {"file_url": "url"})
+    assert not queue.fail(job_id, claim_token, "late")
+    assert queue.get_many([job_id])[job_id]["audio_data"] == {"file_url": "url"}
+
+
+def test_expired_leases_out_of_attempts_fail(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05, max_attempts=1)
+    queue.enqueue_many([make_article(1)])
+    [(job_id, _, _)] = queue.claim(1)
+    time.sleep(0.1)
+    assert queue.claim(1) == []
+    assert status(queue, job_id) == "failed"
+
+
+def test_fail_of_a_missing_job_does_nothing(tmp_path):
+    queue = make_queue(tmp_path)
+    assert not queue.fail("missing", "token", "boom")
+
+
+@pytest.mark.parametrize("limit", [1, 5])
+def test_claim_of_an_empty_queue(tmp_path, limit):
+    assert make_queue(tmp_path).claim(limit) == []
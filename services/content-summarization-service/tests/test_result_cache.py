@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services.result_cache import ResultCache
+
+ARTICLE = {"article_id": "1", "article_title": "Title", "article_description": "Description"}
+
+
+def make_cache(tmp_path, **kwargs) -> ResultCache:
+    return ResultCache(str(tmp_path / "results.sqlite3"), ttl=60, max_entries=10, poll_interval=0.01, **kwargs)
+
+
+def test_results_are_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+    compute = lambda: calls.append(1) or {"file_url": "url"}
+    assert cache.get_or_compute(ARTICLE, compute) == {"file_url": "url"}
+    assert cache.get_or_compute(ARTICLE, compute) == {"file_url": "url"}
+    assert len(calls) == 1
+    # An edited article is summarized again
+    assert cache.get(ResultCache.make_key({**ARTICLE, "article_title": "Edited"})) is None
+
+
+def test_failed_results_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get_or_compute(ARTICLE, lambda: None) is None
+    assert cache.get_or_compute(ARTICLE, lambda: {"file_url": "url"}) == {"file_url": "url"}
+
+
+def test_concurrent_callers_are_coalesced(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {"file_url": "url"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(ARTICLE, compute))) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"file_url": "url"}] * 5
+
+
+def test_async_callers_are_coalesced(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"file_url": "url"}
+
+    async def run():
+        return await asyncio.gather(*(cache.aget_or_compute(ARTICLE, compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == [{"file_url": "url"}] * 5
+    assert len(calls) == 1
+
+
+def test_waiters_get_the_error_of_a_failed_computation(tmp_path):
+    cache = make_cache(tmp_path)
+    started = threading.Event()
+
+    def compute():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute(ARTICLE, compute)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=call)
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    owner.join()
+    waiter.join()
+    assert errors == ["boom", "boom"]
+    # The key was released, the next caller computes it
+    assert cache.get_or_compute(ARTICLE, lambda: {"file_url": "url"}) == {"file_url": "url"}
+
+
+def test_waiters_get_the_result_when_storing_it_fails(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    started = threading.Event()
+
+    def put(key, result):
+        raise OSError("disk full")
+
+    def compute():
+        started.set()
+        time.sleep(0.1)
+        return {"file_url": "url"}
+
+    monkeypatch.setattr(cache, "put", put)
+    owner = threading.Thread(target=lambda: pytest.raises(OSError, cache.get_or_compute, ARTICLE, compute))
+    owner.start()
+    started.wait()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute(ARTICLE, compute)))
+    waiter.start()
+    owner.join()
+    waiter.join()
+    assert results == [{"file_url": "url"}]
+    assert cache._in_flight == {}
+
+
+def test_caches_sharing_a_file_are_coalesced(tmp_path):
+    # Two caches on one file stand for two worker processes
+    first, second = make_cache(tmp_path), make_cache(tmp_path)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {"file_url": "url"}
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(first.get_or_compute(ARTICLE, compute)))
+    owner.start()
+    started.wait()
+    assert second.get_or_compute(ARTICLE, compute) == {"file_url": "url"}
+    owner.join()
+    assert results == [{"file_url": "url"}]
+    assert len(calls) == 1
+
+
+def test_expired_leases_are_taken_over(tmp_path):
+    first, second = make_cache(tmp_path, lease_seconds=0.05), make_cache(tmp_path, lease_seconds=0.05)
+    # A process that died while holding the lease
+    assert first._try_lease(ResultCache.make_key(ARTICLE)) == (None, True)
+    time.sleep(0.1)
+    assert second.get_or_compute(ARTICLE, lambda: {"file_url": "url"}) == {"file_url": "url"}
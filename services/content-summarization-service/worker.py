@@ -0,0 +1,14 @@
+"""
+Job worker of the summarization service.
+
+Runs the jobs enqueued by POST /summarize/jobs, on JOB_WORKERS threads of
+JOB_BATCH_SIZE concurrent articles each. The workers share the job queue
+file with the web processes, run as many of them as the provider quotas
+allow, next to any number of web processes:
+    python worker.py
+"""
+
+from app.services.job_worker import run_workers
+
+if __name__ == "__main__":
+    run_workers()
@@ -0,0 +1,89 @@
+import asyncio
+import urllib.parse
+import aiohttp
+from scrollpedia_common.resilience import ProviderPolicy
+
+
+class AsyncHttpClient:
+    """
+    Pooled async HTTP client shared by every fetch of a pipeline run.
+
+    One aiohttp session (and so one connection pool) is kept open for the
+    lifetime of the client and concurrent requests are capped per host.
+    Requests go through the optional ProviderPolicy, which rate limits them
+    and retries the transient failures.
+    """
+
+    def __init__(
+        self,
+        headers: dict[str, str] | None = None,
+        per_host_limit: int = 8,
+        host_limits: dict[str, int] | None = None,
+        total_limit: int = 64,
+        timeout: float = 10,
+        policy: ProviderPolicy | None = None,
+    ):
+        """
+        :param headers: Headers sent with every request.
+        :param per_host_limit: Default number of in-flight requests allowed per host.
+        :param host_limits: Per-host overrides of per_host_limit, keyed by host name.
+        :param total_limit: Size of the underlying connection pool.
+        :param timeout: Total timeout of a single request in seconds.
+        :param policy: Rate limit, retries and circuit breaker of the requests.
+        """
+        self.headers = headers or {}
+        self.per_host_limit = per_host_limit
+        self.host_limits = host_limits or {}
+        self.total_limit = total_limit
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.policy = policy
+        self._session: aiohttp.ClientSession | None = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        connector = aiohttp.TCPConnector(limit=self.total_limit)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=self.timeout,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urllib.parse.urlsplit(url).hostname or ""
+        if host not in self._host_semaphores:
+            limit = self.host_limits.get(host, self.per_host_limit)
+            self._host_semaphores[host] = asyncio.Semaphore(limit)
+        return self._host_semaphores[host]
+
+    async def get_json(self, url: str, params: dict[str, str] | None = None) -> dict:
+        """
+        Send a GET request and decode the JSON body.
+
+        :param url: The URL to fetch.
+        :param params: Query string parameters.
+        :return: The decoded JSON response.
+        :raises aiohttp.ClientError: On connection errors and non-2xx responses,
+                                     once the policy gave up retrying.
+        :raises CircuitOpenError: If the policy's circuit is open.
+        """
+        if self._session is None:
+            raise RuntimeError("AsyncHttpClient must be used as an async context manager")
+        if self.policy is None:
+            return await self._get_json(url, params)
+        return await self.policy.acall(self._get_json, url, params)
+
+    async def _get_json(self, url: str, params: dict[str, str] | None) -> dict:
+        # The host slot is only held during the request, not while backing off
+        async with self._host_semaphore(url):
+            async with self._session.get(url, params=params) as response:
+                response.raise_for_status()
+                return await response.json()
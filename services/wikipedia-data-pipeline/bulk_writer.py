@@ -0,0 +1,200 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from scrollpedia_common.metrics import metrics
+from scrollpedia_common.resilience import RETRYABLE_STATUSES, ProviderPolicy, classify_error
+
+# SQLSTATE classes of the PostgreSQL errors caused by the rows themselves:
+# data exceptions and integrity constraint violations
+REJECTED_SQLSTATE_CLASSES = ("22", "23")
+# HTTP statuses PostgREST answers these errors with
+REJECTED_STATUSES = {409, 422}
+# Prefix of the PostgREST error codes of its connection to the database
+# (unreachable database, schema cache not loaded yet, exhausted pool)
+TRANSIENT_POSTGREST_CODE_PREFIX = "PGRST00"
+
+
+def is_rejection(error: BaseException) -> bool:
+    """
+    Tell a sink error caused by the rows it was given, which sending them
+    again can't fix, from the others: outages, throttling, a broken schema.
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, str):
+        return code[:2] in REJECTED_SQLSTATE_CLASSES
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status in REJECTED_STATUSES
+
+
+def classify_sink_error(error: BaseException) -> tuple[bool, bool, float | None]:
+    """
+    classify_error for the errors of postgrest, whose APIError only carries a
+    string code: a PGRST00x code when PostgREST couldn't use the database,
+    and the HTTP status when the response had no JSON error, like the 429
+    and 5xx answers of the gateway in front of it.
+    """
+    code = getattr(error, "code", None)
+    if not isinstance(code, str):
+        return classify_error(error)
+    if code.startswith(TRANSIENT_POSTGREST_CODE_PREFIX):
+        return True, False, None
+    if code.isdigit():
+        status = int(code)
+        return status in RETRYABLE_STATUSES or 500 <= status < 600, status == 429, None
+    return False, False, None
+
+
+class BulkWriter:
+    """
+    Writes rows to a sink in chunks bounded by a number of rows and by the
+    size of their JSON payload, with up to concurrency chunks in flight.
+
+    Every chunk goes through the policy on its own, so a failed chunk is
+    retried without sending the others again, and a chunk that still fails
+    only leaves its own rows unwritten. A chunk the sink rejects for good
+    (see is_rejection, like a constraint violation) is split in halves until
+    the rejected rows are isolated, so one bad row doesn't take the rest of
+    its chunk down with it. Rows bigger than max_bytes are
+    sent alone.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[list[dict[str, any]]], None],
+        max_rows: int = 50,
+        max_bytes: int = 1_000_000,
+        concurrency: int = 4,
+        policy: ProviderPolicy | None = None,
+    ):
+        """
+        :param sink: Called from a worker thread with every chunk, for instance to upsert it.
+        :param max_rows: Maximum number of rows of a chunk.
+        :param max_bytes: Maximum size of the JSON payload of a chunk.
+        :param concurrency: Maximum number of chunks written at once.
+        :param policy: Rate limit, retries and circuit breaker of the sink.
+        """
+        self.sink = sink
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.concurrency = concurrency
+        self.policy = policy or ProviderPolicy("sink", rate=1000, classify=classify_sink_error)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk-writer")
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        """
+        Rows written per second spent writing, over every write so far.
+        """
+        with self._lock:
+            return self.rows_written / self.seconds if self.seconds else 0.0
+
+    def chunks(self, rows: list[dict[str, any]]) -> list[list[dict[str, any]]]:
+        """
+        Split rows into chunks of at most max_rows rows and max_bytes of JSON.
+        """
+        chunks = []
+        chunk = []
+        chunk_bytes = 2
+        for row in rows:
+            # Compact JSON plus the separating comma, as close as it gets to the request body
+            row_bytes = len(json.dumps(row, separators=(",", ":"), default=str)) + 1
+            if chunk and (len(chunk) >= self.max_rows or chunk_bytes + row_bytes > self.max_bytes):
+                chunks.append(chunk)
+                chunk = []
+                chunk_bytes = 2
+            chunk.append(row)
+            chunk_bytes += row_bytes
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _write_chunk(self, chunk: list[dict[str, any]]) -> tuple[list[dict[str, any]], list[dict[str, any]], list[dict[str, any]]]:
+        """
+        :return: The rows of the chunk written, failed and rejected.
+        """
+        try:
+            with metrics.span("upsert_chunk"):
+                self.policy.call(self.sink, chunk)
+        except Exception as e:
+            if not is_rejection(e):
+                print(f"Error writing chunk of {len(chunk)} rows: {str(e)}")
+                metrics.increment("upsert_chunks", outcome="failed")
+                return [], chunk, []
+            if len(chunk) == 1:
+                print(f"Row rejected: {str(e)}")
+                metrics.increment("upsert_chunks", outcome="rejected")
+                return [], [], chunk
+            written, failed, rejected = [], [], []
+            for half in (chunk[:len(chunk) // 2], chunk[len(chunk) // 2:]):
+                for total, part in zip((written, failed, rejected), self._write_chunk(half)):
+                    total.extend(part)
+            return written, failed, rejected
+        metrics.increment("upsert_chunks", outcome="written")
+        return chunk, [], []
+
+    def write(self, rows: list[dict[str, any]]) -> tuple[list[dict[str, any]], list[dict[str, any]], list[dict[str, any]]]:
+        """
+        Write rows chunk by chunk, concurrently.
+
+        :return: The rows written, the rows of the chunks that failed after
+                 their retries, and the rows the sink rejected for good.
+        """
+        if not rows:
+            return [], [], []
+        start = time.perf_counter()
+        written, failed, rejected = [], [], []
+        for result in self.executor.map(self._write_chunk, self.chunks(rows)):
+            for total, part in zip((written, failed, rejected), result):
+                total.extend(part)
+        with self._lock:
+            self.rows_written += len(written)
+            self.seconds += time.perf_counter() - start
+        return written, failed, rejected
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+
+class MemorySink:
+    """
+    Local stand-in of the articles table for tests and benchmarks: upserts
+    rows in memory by key, without Supabase.
+
+    It can fail its first writes and take some time per write, to exercise
+    the retries and the concurrency of a BulkWriter.
+    """
+
+    def __init__(
+        self,
+        key: str = "article_id",
+        failures: int = 0,
+        latency: float = 0,
+        error: Callable[[], Exception] | None = None,
+    ):
+        """
+        :param failures: Number of writes failing before the others succeed.
+        :param latency: Seconds every write takes.
+        :param error: Makes the error of a failing write, a ConnectionError by default.
+        """
+        self.key = key
+        self.failures = failures
+        self.latency = latency
+        self.error = error or (lambda: ConnectionError("Memory sink write failed"))
+        self.rows: dict[any, dict[str, any]] = {}
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, rows: list[dict[str, any]]) -> None:
+        time.sleep(self.latency)
+        with self._lock:
+            self.writes += 1
+            if self.failures > 0:
+                self.failures -= 1
+                raise self.error()
+            for row in rows:
+                self.rows[row[self.key]] = row
@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+import zlib
+from known_articles import KnownArticles
+
+# Namespaces of categorymembers entries
+ARTICLE_NAMESPACE = 0
+CATEGORY_NAMESPACE = 14
+
+
+class CategoryFrontier:
+    """
+    Crawl state of the category trees, persisted in SQLite between runs.
+
+    Every main category's tree is crawled breadth first from its seed
+    categories down to max_depth levels of subcategories. Listings follow
+    cmcontinue, and the continuation is stored, so a category is listed
+    from where the previous request stopped, even in a previous run.
+
+    Every listed page is recorded once. It stays pending until the fetch
+    stage decided on it, so pages listed but left over when a run's budget
+    ran out are the first ones handed out by the next run, and a page is
+    never fetched twice.
+
+    A frontier can be restricted to one shard of the trees, so parallel
+    backfill workers split the crawl instead of each listing the whole
+    trees: the pages of the seed categories are split by page id, and the
+    subtrees below them by the title of their top subcategory. A page listed
+    in subtrees of two shards is fetched by both, and only stored once.
+    """
+
+    def __init__(self, path: str, max_depth: int = 2, shard_index: int = 0, shard_count: int = 1):
+        """
+        :param path: Path of the SQLite database file, created if missing.
+        :param max_depth: Levels of subcategories crawled below the seed categories.
+        :param shard_index: Shard of the trees crawled, from 0 to shard_count - 1.
+        :param shard_count: Number of shards the trees are split into.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_depth = max_depth
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS categories ("
+            "title TEXT PRIMARY KEY, main_category TEXT NOT NULL, root TEXT NOT NULL, "
+            "depth INTEGER NOT NULL, cmcontinue TEXT, exhausted INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, page_id INTEGER NOT NULL UNIQUE, title TEXT NOT NULL, "
+            "main_category TEXT NOT NULL, subcategory TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS pages_pending ON pages (main_category, done, seq);"
+        )
+        self._conn.commit()
+
+    def seed(self, main_category: str, titles: list[str]) -> None:
+        """
+        Add the seed categories of a main category, the ones already known are left as they are.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO categories (title, main_category, root, depth) VALUES (?, ?, ?, 0)",
+                [(title, main_category, title) for title in titles],
+            )
+            self._conn.commit()
+
+    def next_category(self, main_category: str) -> dict[str, any] | None:
+        """
+        The shallowest category of a main category that still has members to list.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, root, depth, cmcontinue FROM categories "
+                "WHERE main_category = ? AND exhausted = 0 ORDER BY depth, rowid LIMIT 1",
+                (main_category,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"title": row[0], "root": row[1], "depth": row[2], "cmcontinue": row[3]}
+
+    def record_listing(
+        self,
+        main_category: str,
+        category: dict[str, any],
+        members: list[dict[str, any]],
+        cmcontinue: str | None,
+        known_articles: KnownArticles,
+    ) -> tuple[int, int]:
+        """
+        Record one categorymembers response of a category returned by next_category.
+
+        Subcategories of the shard within max_depth join the frontier, pages
+        of the shard not seen before become pending, unless they are known
+        articles already.
+
+        :param cmcontinue: Continuation of the listing, None once it is complete.
+        :return: The numbers of new pending pages and of new categories.
+        """
+        subcategories = []
+        pages = []
+        # Seed categories are listed by every shard, what is below them belongs to one
+        is_seed = category["depth"] == 0
+        for member in members:
+            if member["ns"] == CATEGORY_NAMESPACE and category["depth"] < self.max_depth:
+                title = member["title"].split(":", 1)[1]
+                if not is_seed or self._in_shard(zlib.crc32(title.encode("utf-8"))):
+                    subcategories.append((title, main_category, category["root"], category["depth"] + 1))
+            elif member["ns"] == ARTICLE_NAMESPACE and (not is_seed or self._in_shard(member["pageid"])):
+                pages.append((member["pageid"], member["title"], main_category, category["root"]))
+
+        with self._lock:
+            new_categories = self._conn.executemany(
+                "INSERT OR IGNORE INTO categories (title, main_category, root, depth) VALUES (?, ?, ?, ?)",
+                subcategories,
+            ).rowcount
+            new_pages = self._conn.executemany(
+                "INSERT OR IGNORE INTO pages (page_id, title, main_category, subcategory, done) VALUES (?, ?, ?, ?, 0)",
+                [page for page in pages if page[0] not in known_articles],
+            ).rowcount
+            # Known articles are recorded as done, never to be listed again
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO pages (page_id, title, main_category, subcategory, done) VALUES (?, ?, ?, ?, 1)",
+                [page for page in pages if page[0] in known_articles],
+            )
+            self._conn.execute(
+                "UPDATE categories SET cmcontinue = ?, exhausted = ? WHERE title = ?",
+                (cmcontinue, 0 if cmcontinue else 1, category["title"]),
+            )
+            self._conn.commit()
+        return new_pages, new_categories
+
+    def _in_shard(self, key: int) -> bool:
+        return key % self.shard_count == self.shard_index
+
+    def pending_pages(self, main_category: str, after_seq: int = 0, limit: int = 20) -> list[dict[str, any]]:
+        """
+        Pending pages of a main category in listing order, after the one numbered after_seq.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, page_id, title, subcategory FROM pages "
+                "WHERE main_category = ? AND done = 0 AND seq > ? ORDER BY seq LIMIT ?",
+                (main_category, after_seq, limit),
+            ).fetchall()
+        return [{"seq": seq, "page_id": page_id, "title": title, "subcategory": subcategory} for seq, page_id, title, subcategory in rows]
+
+    def mark_done(self, page_ids: list[int]) -> None:
+        """
+        Mark pages the fetch stage decided on, stored or skipped, so they are never handed out again.
+        """
+        if not page_ids:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE pages SET done = 1 WHERE page_id = ?", [(page_id,) for page_id in page_ids])
+            self._conn.commit()
+
+    def restart(self, main_category: str) -> None:
+        """
+        Start a new pass over a fully crawled tree, to pick up the pages added since.
+        The pages seen in earlier passes are still skipped.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE categories SET cmcontinue = NULL, exhausted = 0 WHERE main_category = ?",
+                (main_category,),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
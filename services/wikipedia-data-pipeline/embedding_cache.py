@@ -0,0 +1,98 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of text embeddings backed by SQLite.
+
+    Entries are keyed by a hash of the model name and the serialized text that
+    was embedded, so an unchanged article maps to the same entry on every run.
+    Embeddings are stored as the bytes of an EmbeddingCodec, the cache does
+    not look into them.
+    The cache holds at most max_entries embeddings, the least recently used
+    ones are evicted first.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        """
+        :param path: Path of the SQLite database file, created if missing.
+        :param max_entries: Maximum number of embeddings kept on disk.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        # The pipeline looks embeddings up from worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        """
+        Look up many embeddings at once, refreshing their last use.
+
+        :param keys: Keys built with make_key.
+        :return: The cached embeddings, keyed by the keys that were found.
+        """
+        found = {}
+        with self._lock:
+            # Stay below SQLite's default limit of 999 bound parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = blob
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, entries: dict[str, bytes]) -> None:
+        """
+        Store many embeddings at once and evict the least recently used ones
+        above max_entries.
+
+        :param entries: Embeddings keyed by keys built with make_key.
+        """
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                [(key, embedding, now) for key, embedding in entries.items()],
+            )
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
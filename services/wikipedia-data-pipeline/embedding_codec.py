@@ -0,0 +1,132 @@
+import base64
+import struct
+import numpy as np
+
+# First byte of an encoded embedding, so any stored embedding can be decoded
+# whatever the codec of the run reading it
+DTYPE_CODES = {"float32": 0, "float16": 1, "int8": 2}
+DTYPES = {code: dtype for dtype, code in DTYPE_CODES.items()}
+# Significant digits of the pgvector text form, about the precision of every dtype
+PGVECTOR_DIGITS = {"float32": 7, "float16": 4, "int8": 4}
+
+
+class EmbeddingCodec:
+    """
+    Compact representations of text embeddings.
+
+    In memory an embedding is a float32 numpy array, 4 bytes per dimension
+    instead of the 32 of a list of Python floats. Stored or sent, it is
+    encoded as a one byte dtype code, a float32 scale for int8, and the
+    little-endian values: float32, float16 (2 bytes per dimension) or int8
+    (1 byte per dimension, symmetric quantization against the largest
+    absolute value of the embedding).
+
+    Embeddings can also be truncated to their first dimensions and
+    renormalized, which Gemini's text-embedding-004 is trained for. Truncated
+    embeddings can only be compared with embeddings truncated the same way,
+    the profile embeddings included.
+
+    A codec is described by a spec, dtype[:dimensions], like "int8:256".
+    """
+
+    def __init__(self, dtype: str = "float32", dimensions: int | None = None):
+        """
+        :param dtype: One of float32, float16 and int8.
+        :param dimensions: Number of dimensions kept, None keeps them all.
+        """
+        if dtype not in DTYPE_CODES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        self.dtype = dtype
+        self.dimensions = dimensions or None
+
+    @classmethod
+    def from_spec(cls, spec: str | None) -> "EmbeddingCodec":
+        if not spec:
+            return cls()
+        dtype, _, dimensions = spec.partition(":")
+        return cls(dtype, int(dimensions) if dimensions else None)
+
+    @property
+    def spec(self) -> str:
+        return f"{self.dtype}:{self.dimensions}" if self.dimensions else self.dtype
+
+    def prepare(self, values) -> np.ndarray:
+        """
+        The in-memory form of an embedding: float32, truncated and renormalized if the codec truncates.
+        """
+        vector = np.asarray(values, dtype=np.float32)
+        if self.dimensions and len(vector) > self.dimensions:
+            vector = vector[:self.dimensions]
+            vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        return vector
+
+    def encode(self, values) -> bytes:
+        vector = self.prepare(values)
+        header = bytes([DTYPE_CODES[self.dtype]])
+        if self.dtype == "int8":
+            scale = float(np.abs(vector).max()) / 127 or 1.0
+            quantized = np.clip(np.rint(vector / scale), -127, 127).astype("<i1")
+            return header + struct.pack("<f", scale) + quantized.tobytes()
+        return header + vector.astype("<f2" if self.dtype == "float16" else "<f4").tobytes()
+
+    def roundtrip(self, values) -> np.ndarray:
+        """
+        The embedding as it reads back once stored, so fresh and cached embeddings are identical.
+        """
+        return decode(self.encode(values))
+
+    def to_wire(self, values) -> str:
+        """
+        Base64 text form of encode, for JSON payloads and files.
+        """
+        return base64.b64encode(self.encode(values)).decode("ascii")
+
+    def to_pgvector(self, values) -> str:
+        """
+        Text form of a pgvector column, with no more digits than the dtype holds.
+        """
+        digits = PGVECTOR_DIGITS[self.dtype]
+        return "[" + ",".join(format(value, f".{digits}g") for value in self.prepare(values).tolist()) + "]"
+
+
+def decode(data: bytes) -> np.ndarray:
+    """
+    Decode an embedding encoded by any codec into its float32 in-memory form.
+    """
+    dtype = DTYPES[data[0]]
+    if dtype == "int8":
+        (scale,) = struct.unpack_from("<f", data, 1)
+        return np.frombuffer(data, dtype="<i1", offset=5).astype(np.float32) * np.float32(scale)
+    return np.frombuffer(data, dtype="<f2" if dtype == "float16" else "<f4", offset=1).astype(np.float32)
+
+
+def from_wire(text: str) -> np.ndarray:
+    return decode(base64.b64decode(text))
+
+
+def measure_recall(vectors, codec: EmbeddingCodec, k: int = 10, queries: int = 100) -> float:
+    """
+    Recall at k of a cosine search over the codec's embeddings, against the
+    same search over the original ones. Every one of the first queries
+    vectors is searched for among all the others.
+
+    :param vectors: Original embeddings, at least k + 1 of them.
+    :return: The fraction of the true k nearest neighbours still found, 1.0 being lossless.
+    """
+    original = np.asarray(vectors, dtype=np.float32)
+    original = original / np.maximum(np.linalg.norm(original, axis=1, keepdims=True), 1e-12)
+    encoded = np.stack([codec.roundtrip(vector) for vector in original])
+    encoded = encoded / np.maximum(np.linalg.norm(encoded, axis=1, keepdims=True), 1e-12)
+    queries = min(queries, len(original))
+    k = min(k, len(original) - 1)
+
+    def top_k(matrix: np.ndarray) -> np.ndarray:
+        scores = matrix[:queries] @ matrix.T
+        # A vector is not its own neighbour
+        scores[np.arange(queries), np.arange(queries)] = -np.inf
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+    expected = top_k(original)
+    found = top_k(encoded)
+    hits = sum(len(set(expected[row]) & set(found[row])) for row in range(queries))
+    return hits / (queries * k)
@@ -1,25 +1,97 @@
 from google import genai
+import numpy as np
+from embedding_cache import EmbeddingCache
+from embedding_codec import EmbeddingCodec, decode
+from scrollpedia_common.metrics import metrics
+from scrollpedia_common.resilience import ProviderPolicy
 
 class GeminiService:
-    def __init__(self, api_key: str):
+    # Maximum number of contents accepted by a single embed_content call
+    EMBED_BATCH_LIMIT = 100
+    # Defaults of the embed_content calls per second and of the timeout of a call in seconds
+    DEFAULT_RATE_LIMIT = 5
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(
+        self,
+        api_key: str,
+        cache: EmbeddingCache | None = None,
+        policy: ProviderPolicy | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        codec: EmbeddingCodec | None = None,
+    ):
         """
         Initialize the GeminiService with the provided API key.
+
+        The underlying client is meant to be long-lived, create one service per
+        pipeline run and reuse it for every embedding.
+
+        :param cache: Optional embedding cache consulted before calling Gemini.
+        :param policy: Rate limit, retries and circuit breaker of the embed_content calls.
+        :param timeout: Timeout of a single embed_content call in seconds.
+        :param codec: Precision and dimensions of the embeddings returned and cached, float32 by default.
         """
-        self.genAI = genai.Client(api_key=api_key)
+        self.genAI = genai.Client(api_key=api_key, http_options={"timeout": int(timeout * 1000)})
         self.model = None
+        self.cache = cache
+        self.policy = policy or ProviderPolicy("gemini", rate=self.DEFAULT_RATE_LIMIT)
+        self.codec = codec or EmbeddingCodec()
 
-    def get_text_embedding(self, data: any, model: str = "text-embedding-004") -> list | None:
+    def get_text_embedding(self, data: any, model: str = "text-embedding-004") -> np.ndarray | None:
         """
         Get text embedding from Gemini AI.
 
         :param data: The input data to embed.
         :param model: The model to use for embedding (default: "text-embedding-004").
-        :return: A list of embedding values.
+        :return: The embedding as a float32 array.
+        """
+        return self.get_text_embeddings([data], model=model)[0]
+
+    def get_text_embeddings(self, data: list[any], model: str = "text-embedding-004") -> list[np.ndarray | None]:
+        """
+        Get text embeddings of many records, EMBED_BATCH_LIMIT contents per call.
+
+        :param data: The input records to embed, each serialized with str().
+        :param model: The model to use for embedding (default: "text-embedding-004").
+        :return: One float32 array per record, in order, as encoded by the
+                 codec. Records of a batch that failed get None.
         """
-        serialize_text = str(data)  # Serialize the input data to a string
         self.model = model
-        result = self.genAI.models.embed_content(
-            model=self.model,
-            contents=serialize_text
-        )
-        return result.embeddings[0].values
+        serialize_texts = [str(record) for record in data]  # Serialize the input data to strings
+        embeddings = [None] * len(serialize_texts)
+
+        # Only send the records the cache doesn't know about
+        missing = list(range(len(serialize_texts)))
+        if self.cache is not None:
+            # A codec change must not return embeddings of another precision or size
+            keys = [EmbeddingCache.make_key(text, f"{self.model}/{self.codec.spec}") for text in serialize_texts]
+            cached = self.cache.get_many(keys)
+            for index, key in enumerate(keys):
+                if key in cached:
+                    embeddings[index] = decode(cached[key])
+            missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+            metrics.increment("embedding_cache_hits", len(cached))
+            metrics.increment("embedding_cache_misses", len(missing))
+
+        fetched = {}
+        for i in range(0, len(missing), self.EMBED_BATCH_LIMIT):
+            batch = missing[i:i + self.EMBED_BATCH_LIMIT]
+            try:
+                with metrics.span("embedding_request"):
+                    result = self.policy.call(
+                        self.genAI.models.embed_content,
+                        model=self.model,
+                        contents=[serialize_texts[index] for index in batch]
+                    )
+            except Exception as e:
+                print(f"Error embedding batch of {len(batch)} records: {e}")
+                continue
+            for index, embedding in zip(batch, result.embeddings):
+                encoded = self.codec.encode(embedding.values)
+                embeddings[index] = decode(encoded)
+                if self.cache is not None:
+                    fetched[keys[index]] = encoded
+
+        if fetched:
+            self.cache.put_many(fetched)
+        return embeddings
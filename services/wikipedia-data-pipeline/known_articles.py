@@ -0,0 +1,90 @@
+import os
+from array import array
+
+
+class KnownArticles:
+    """
+    Set of the article ids (Wikipedia page ids) already stored in the articles table.
+
+    Loaded once per run so already stored pages can be dropped right after
+    they are listed, before any extract, embedding or audio work is spent on
+    them. A local snapshot keeps the set available when Supabase is not.
+    """
+
+    # Rows fetched per Supabase request when loading the ids
+    PAGE_SIZE = 1000
+
+    def __init__(self, page_ids: set[int] | None = None):
+        self.page_ids = set(page_ids or ())
+
+    def __contains__(self, page_id: int) -> bool:
+        return page_id in self.page_ids
+
+    def __len__(self) -> int:
+        return len(self.page_ids)
+
+    def add(self, page_id: int) -> None:
+        self.page_ids.add(page_id)
+
+    @classmethod
+    def from_supabase(cls, supabase, table: str = "articles") -> "KnownArticles":
+        """
+        Load every stored article id from Supabase, PAGE_SIZE rows at a time.
+
+        :param supabase: A Supabase client.
+        :param table: The table holding the articles.
+        """
+        page_ids = set()
+        start = 0
+        while True:
+            result = supabase.table(table).select("article_id").order("article_id").range(start, start + cls.PAGE_SIZE - 1).execute()
+            page_ids.update(row["article_id"] for row in result.data)
+            if len(result.data) < cls.PAGE_SIZE:
+                break
+            start += cls.PAGE_SIZE
+        return cls(page_ids)
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "KnownArticles":
+        """
+        Load the ids from a snapshot written by save_snapshot, empty if there is none.
+        """
+        if not os.path.exists(path):
+            return cls()
+        page_ids = array("q")
+        with open(path, "rb") as f:
+            page_ids.frombytes(f.read())
+        return cls(set(page_ids))
+
+    def save_snapshot(self, path: str) -> None:
+        """
+        Write the ids as a packed array of 64-bit integers.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(array("q", sorted(self.page_ids)).tobytes())
+        os.replace(tmp_path, path)
+
+
+def load_known_articles(supabase, snapshot_path: str | None = None) -> KnownArticles:
+    """
+    Load the known article ids from Supabase and refresh the local snapshot,
+    falling back to the snapshot when Supabase can't be reached.
+
+    :param supabase: A Supabase client, or None to only use the snapshot.
+    :param snapshot_path: Path of the local snapshot, or None to not keep one.
+    """
+    if supabase is not None:
+        try:
+            known_articles = KnownArticles.from_supabase(supabase)
+            if snapshot_path:
+                known_articles.save_snapshot(snapshot_path)
+            return known_articles
+        except Exception as e:
+            print(f"Error loading known articles from Supabase, using the local snapshot: {e}")
+    if snapshot_path:
+        return KnownArticles.from_snapshot(snapshot_path)
+    return KnownArticles()
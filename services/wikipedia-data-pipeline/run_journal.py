@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+from embedding_codec import EmbeddingCodec, from_wire
+
+# Stages an article goes through, in order, before it is upserted
+STAGES = ("fetched", "embedded", "summarized")
+
+
+class RunJournal:
+    """
+    Append-only checkpoint journal of the articles a run completed stages for.
+
+    Every article is written as a JSON line once it is fetched, embedded and
+    summarized, and its id once it is upserted or dropped for good (a
+    near-duplicate, a row the database rejects). Dropped ids are kept, so
+    later runs don't pick these articles again. A run that crashed or failed
+    to upsert leaves the journal behind: the next run resumes every article
+    that was not upserted from its last completed stage, instead of paying
+    again for its embedding, audio summary and upload.
+
+    Resumes are recorded too, and an article still unfinished after
+    max_resumes of them is given up on, so an article that always fails
+    doesn't come back on every run.
+
+    On opening, the journal is compacted down to the dropped ids and the
+    latest line of every article still to be upserted.
+    Embeddings are written in the base64 form of the run's EmbeddingCodec.
+    """
+
+    def __init__(self, path: str | None, codec: EmbeddingCodec | None = None, max_resumes: int = 3):
+        """
+        :param path: Path of the JSONL file, created if missing. None keeps
+                     nothing, for runs that don't need to be resumed.
+        :param codec: Codec of the embeddings written, float32 by default.
+        :param max_resumes: Resumes after which an unfinished article is given up on.
+        """
+        self.path = path
+        self.codec = codec or EmbeddingCodec()
+        self.max_resumes = max_resumes
+        self._lock = threading.Lock()
+        self._file = None
+        # Latest completed stage and record of every article not upserted yet
+        self.pending: dict[int, tuple[str, dict[str, any]]] = {}
+        # Times every pending article was resumed so far
+        self.resumes: dict[int, int] = {}
+        # Ids of the articles given up on when opening
+        self.retired: list[int] = []
+        # Ids of every article dropped for good, the retired ones included
+        self.dropped: set[int] = set()
+        if path is None:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._replay()
+        self._compact()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line of a crashed run can be cut short
+                    continue
+                if entry["stage"] in ("upserted", "dropped"):
+                    for article_id in entry["article_ids"]:
+                        self.pending.pop(article_id, None)
+                        self.resumes.pop(article_id, None)
+                    if entry["stage"] == "dropped":
+                        self.dropped.update(entry["article_ids"])
+                elif entry["stage"] == "resumed":
+                    for article_id in entry["article_ids"]:
+                        self.resumes[article_id] = self.resumes.get(article_id, 0) + 1
+                else:
+                    article = entry["article"]
+                    if article.get("article_embedding") is not None:
+                        article["article_embedding"] = from_wire(article["article_embedding"])
+                    self.pending[article["article_id"]] = (entry["stage"], article)
+                    # Compacted lines carry the resumes of their article
+                    self.resumes[article["article_id"]] = max(
+                        self.resumes.get(article["article_id"], 0), entry.get("resumes", 0)
+                    )
+        self.retired = [article_id for article_id in self.pending if self.resumes.get(article_id, 0) >= self.max_resumes]
+        for article_id in self.retired:
+            del self.pending[article_id]
+            del self.resumes[article_id]
+        self.dropped.update(self.retired)
+
+    def _compact(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if self.dropped:
+                f.write(json.dumps({"stage": "dropped", "article_ids": sorted(self.dropped)}) + "\n")
+            for article_id, (stage, article) in self.pending.items():
+                entry = {"stage": stage, "article": self._serializable(article), "resumes": self.resumes.get(article_id, 0)}
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def resumable(self, stage: str) -> list[dict[str, any]]:
+        """
+        The articles of earlier runs whose last completed stage is stage.
+        """
+        return [article for last_stage, article in self.pending.values() if last_stage == stage]
+
+    def _serializable(self, article: dict[str, any]) -> dict[str, any]:
+        if article.get("article_embedding") is None:
+            return article
+        return {**article, "article_embedding": self.codec.to_wire(article["article_embedding"])}
+
+    def _append(self, entry: dict[str, any]) -> None:
+        if self._file is None:
+            return
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def record(self, stage: str, article: dict[str, any]) -> None:
+        """
+        Checkpoint an article that completed stage, one of STAGES.
+        """
+        self._append({"stage": stage, "article": self._serializable(article)})
+
+    def record_upserted(self, article_ids: list[int]) -> None:
+        self._append({"stage": "upserted", "article_ids": article_ids})
+
+    def record_dropped(self, article_ids: list[int], reason: str) -> None:
+        """
+        Retire articles that will never be upserted, so they are not resumed.
+        """
+        if article_ids:
+            self.dropped.update(article_ids)
+            self._append({"stage": "dropped", "article_ids": article_ids, "reason": reason})
+
+    def record_resumed(self, article_ids: list[int]) -> None:
+        """
+        Count a resume of every one of the articles, towards max_resumes.
+        """
+        if article_ids:
+            self._append({"stage": "resumed", "article_ids": article_ids})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
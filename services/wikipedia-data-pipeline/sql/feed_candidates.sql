@@ -0,0 +1,10 @@
+-- Candidate lists precomputed by the pipeline for the feed, see
+-- publish_feed_candidates in vector_index.py. Create the table before
+-- setting the PUBLISH_FEED_CANDIDATES secret to 1.
+create table if not exists public.feed_candidates (
+    -- tag:<tag> or profile:<user_id>
+    candidate_key text primary key,
+    -- Ids of the closest articles, best first
+    article_ids bigint[] not null,
+    updated_at timestamptz not null default now()
+);
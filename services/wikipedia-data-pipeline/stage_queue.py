@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+# Marker put on the queue once every producer is done
+_CLOSED = object()
+
+
+class StageClosed(Exception):
+    """Raised by StageQueue.get once the queue is closed and drained."""
+
+
+class StageQueue:
+    """
+    Bounded queue connecting two stages of the streaming pipeline.
+
+    put blocks while the queue is full, so a slow stage holds back the ones
+    feeding it instead of letting items pile up in memory. Every producer
+    calls close when it is done; once the last one has, consumers drain what
+    is left and then get StageClosed.
+    """
+
+    def __init__(self, maxsize: int, producers: int = 1):
+        """
+        :param maxsize: Maximum number of items waiting in the queue.
+        :param producers: Number of workers putting items, each has to call close.
+        """
+        self._queue = asyncio.Queue(maxsize)
+        self._open_producers = producers
+
+    async def put(self, item: any) -> None:
+        await self._queue.put(item)
+
+    async def close(self) -> None:
+        self._open_producers -= 1
+        if self._open_producers == 0:
+            await self._queue.put(_CLOSED)
+
+    async def get(self) -> any:
+        """
+        :raises StageClosed: Once every producer closed the queue and it is drained.
+        """
+        item = await self._queue.get()
+        if item is _CLOSED:
+            # Leave the marker for the other consumers, there is room since
+            # we just took it out and every producer is done
+            self._queue.put_nowait(_CLOSED)
+            raise StageClosed()
+        return item
+
+    async def get_batch(self, max_size: int, max_wait: float) -> list[any]:
+        """
+        Get up to max_size items, waiting at most max_wait seconds after the
+        first one for the batch to fill up.
+
+        :raises StageClosed: Once every producer closed the queue and it is drained.
+        """
+        batch = [await self.get()]
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 0.05))
+                continue
+            if item is _CLOSED:
+                self._queue.put_nowait(_CLOSED)
+                break
+            batch.append(item)
+        return batch
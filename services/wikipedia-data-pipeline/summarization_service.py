@@ -1,7 +1,33 @@
+import time
 import requests
+from scrollpedia_common.resilience import CircuitOpenError, ProviderPolicy
 
 class SummarizationService:
-        
+    # Defaults of the requests per second and of the timeout of a request in seconds,
+    # a batch is summarized within the service's 300s worker timeout
+    DEFAULT_RATE_LIMIT = 4
+    DEFAULT_TIMEOUT = 300
+    # Job states after which a job doesn't change anymore
+    FINISHED_JOB_STATUSES = {"done", "failed"}
+
+    def __init__(self, policy: ProviderPolicy | None = None, timeout: float = DEFAULT_TIMEOUT):
+        """
+        :param policy: Rate limit, retries and circuit breaker of the requests to the service.
+        :param timeout: Timeout of a single request in seconds.
+        """
+        self.policy = policy or ProviderPolicy("summarization", rate=self.DEFAULT_RATE_LIMIT)
+        self.timeout = timeout
+
+    def _post(self, url: str, body: dict) -> dict:
+        response = requests.post(url=url, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _get(self, url: str, params: dict) -> dict:
+        response = requests.get(url=url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
     def get_article_audio_data(self, data: dict[str, str], service_base_url: str, endpoint: str) -> str | None:
         """
         Get the audio summary link for the provided article data.
@@ -10,12 +36,71 @@ class SummarizationService:
         :return: The URL of the audio summary or None if an error occurs.
         """
         try:
-            response = requests.post(
-                url=f"{service_base_url}/{endpoint}",
-                json=data,
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            return self.policy.call(self._post, f"{service_base_url}/{endpoint}", data)
+        except (requests.RequestException, CircuitOpenError) as e:
             print(f"Error fetching audio summary link: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def get_articles_audio_data(self, data: list[dict[str, str]], service_base_url: str, endpoint: str) -> dict[int, dict] | None:
+        """
+        Get the audio summaries of many articles with a single batch request.
+        Retried batches are cheap, the service caches the summaries it already made.
+
+        :param data: The articles data, each with article_id, article_title, article_description.
+        :return: The audio data keyed by article_id (None for the articles that failed),
+                 or None if the request itself failed.
+        """
+        try:
+            response = self.policy.call(self._post, f"{service_base_url}/{endpoint}", {"articles": data})
+            return {
+                result.get("article_id"): result.get("audio_data")
+                for result in response.get("data", [])
+            }
+        except (requests.RequestException, CircuitOpenError) as e:
+            print(f"Error fetching audio summary links: {e}")
+            return None
+
+    def get_articles_audio_data_from_jobs(
+        self,
+        data: list[dict[str, str]],
+        service_base_url: str,
+        endpoint: str = "summarize/jobs",
+        poll_interval: float = 5,
+        timeout: float = 900,
+    ) -> dict[int, dict] | None:
+        """
+        Get the audio summaries of many articles through the service's job
+        queue: enqueue a job per article, then poll all of them at once until
+        they are finished. No request is held open while the service's
+        workers summarize.
+
+        :param data: The articles data, each with article_id, article_title, article_description.
+        :param poll_interval: Seconds between two polls of the jobs.
+        :param timeout: Seconds after which the jobs still running are given up on.
+        :return: The audio data keyed by article_id (None for the articles that
+                 failed or timed out), or None if the jobs couldn't be enqueued.
+        """
+        url = f"{service_base_url}/{endpoint}"
+        try:
+            jobs = self.policy.call(self._post, url, {"articles": data}).get("data", [])
+        except (requests.RequestException, CircuitOpenError) as e:
+            print(f"Error enqueuing summarization jobs: {e}")
+            return None
+
+        audio_data = {job["article_id"]: None for job in jobs}
+        pending = {job["job_id"]: job["article_id"] for job in jobs}
+        deadline = time.monotonic() + timeout
+        while pending and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            try:
+                response = self.policy.call(self._get, url, {"ids": ",".join(pending)})
+            except (requests.RequestException, CircuitOpenError) as e:
+                # The jobs keep running, poll them again
+                print(f"Error polling summarization jobs: {e}")
+                continue
+            for job in response.get("data", []):
+                if job["status"] in self.FINISHED_JOB_STATUSES:
+                    audio_data[pending.pop(job["job_id"])] = job.get("audio_data")
+        if pending:
+            print(f"Gave up on {len(pending)} summarization jobs after {timeout}s")
+        return audio_data
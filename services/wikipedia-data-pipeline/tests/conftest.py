@@ -0,0 +1,8 @@
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The pipeline modules sit next to the Modal app rather than in a package,
+# and scrollpedia_common may not be installed in the test environment
+sys.path[:0] = [SERVICE_DIR, os.path.join(os.path.dirname(SERVICE_DIR), "common")]
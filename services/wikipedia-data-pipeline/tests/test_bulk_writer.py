@@ -0,0 +1,86 @@
+import pytest
+from bulk_writer import BulkWriter, MemorySink, classify_sink_error
+from scrollpedia_common.resilience import ProviderPolicy
+
+
+class APIError(Exception):
+    """Shaped like postgrest.exceptions.APIError, whose code is always a string."""
+
+    def __init__(self, code: str, message: str = "error"):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def make_writer(sink: MemorySink, max_rows: int = 2) -> BulkWriter:
+    policy = ProviderPolicy("sink", rate=1000, base_delay=0.001, max_delay=0.001, classify=classify_sink_error)
+    return BulkWriter(sink, max_rows=max_rows, concurrency=2, policy=policy)
+
+
+def make_rows(count: int) -> list[dict]:
+    return [{"article_id": i, "title": f"Article {i}"} for i in range(count)]
+
+
+@pytest.mark.parametrize("code", ["PGRST000", "PGRST003", "429", "500", "503"])
+def test_transient_postgrest_errors_are_retried(code):
+    sink = MemorySink(failures=2, error=lambda: APIError(code))
+    writer = make_writer(sink)
+    written, failed, rejected = writer.write(make_rows(4))
+    writer.close()
+    assert len(written) == 4
+    assert failed == rejected == []
+    assert sorted(sink.rows) == [0, 1, 2, 3]
+
+
+def test_connection_errors_are_retried():
+    sink = MemorySink(failures=3)
+    writer = make_writer(sink)
+    written, failed, _ = writer.write(make_rows(4))
+    writer.close()
+    assert len(written) == 4
+    assert failed == []
+
+
+def test_persistent_failures_only_fail_their_chunk():
+    # Every attempt of the first chunk fails, the second chunk is written
+    sink = MemorySink(failures=4, error=lambda: APIError("503"))
+    writer = BulkWriter(sink, max_rows=2, concurrency=1, policy=ProviderPolicy("sink", rate=1000, base_delay=0.001, classify=classify_sink_error))
+    written, failed, rejected = writer.write(make_rows(4))
+    writer.close()
+    assert [row["article_id"] for row in written] == [2, 3]
+    assert [row["article_id"] for row in failed] == [0, 1]
+    assert rejected == []
+
+
+def test_rejected_rows_are_isolated():
+    def sink(rows):
+        if any(row["article_id"] == 2 for row in rows):
+            raise APIError("23502", "null value in column violates not-null constraint")
+        memory(rows)
+
+    memory = MemorySink()
+    writer = make_writer(sink, max_rows=4)
+    written, failed, rejected = writer.write(make_rows(4))
+    writer.close()
+    assert sorted(row["article_id"] for row in written) == [0, 1, 3]
+    assert failed == []
+    assert [row["article_id"] for row in rejected] == [2]
+    # A rejection is answered at once, without retries
+    assert memory.writes == 2
+
+
+@pytest.mark.parametrize(
+    ("error", "expected"),
+    [
+        (APIError("PGRST001"), (True, False, None)),
+        (APIError("429"), (True, True, None)),
+        (APIError("502"), (True, False, None)),
+        (APIError("404"), (False, False, None)),
+        (APIError("PGRST116"), (False, False, None)),
+        (APIError("23505"), (False, False, None)),
+        (ConnectionError(), (True, False, None)),
+        (RuntimeError(), (False, False, None)),
+    ],
+)
+def test_classify_sink_error(error, expected):
+    assert classify_sink_error(error) == expected
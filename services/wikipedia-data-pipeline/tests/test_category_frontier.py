@@ -0,0 +1,84 @@
+import zlib
+from category_frontier import ARTICLE_NAMESPACE, CATEGORY_NAMESPACE, CategoryFrontier
+from known_articles import KnownArticles
+
+MAIN_CATEGORY = "Science"
+
+
+def page(page_id: int) -> dict:
+    return {"ns": ARTICLE_NAMESPACE, "pageid": page_id, "title": f"Page {page_id}"}
+
+
+def subcategory(title: str) -> dict:
+    return {"ns": CATEGORY_NAMESPACE, "pageid": zlib.crc32(title.encode("utf-8")), "title": f"Category:{title}"}
+
+
+def make_frontier(tmp_path, shard_index: int = 0, shard_count: int = 1, max_depth: int = 2) -> CategoryFrontier:
+    frontier = CategoryFrontier(str(tmp_path / f"frontier-{shard_index}.sqlite3"), max_depth, shard_index, shard_count)
+    frontier.seed(MAIN_CATEGORY, ["Physics"])
+    return frontier
+
+
+def crawl(frontier: CategoryFrontier, listings: dict[str, list[dict]]) -> tuple[set[str], set[int]]:
+    """
+    List every category of the frontier, with the members given by listings.
+
+    :return: The categories listed and the pending page ids.
+    """
+    listed = set()
+    while (category := frontier.next_category(MAIN_CATEGORY)) is not None:
+        listed.add(category["title"])
+        frontier.record_listing(MAIN_CATEGORY, category, listings.get(category["title"], []), None, KnownArticles())
+    pages = {page["page_id"] for page in frontier.pending_pages(MAIN_CATEGORY, limit=1000)}
+    return listed, pages
+
+
+LISTINGS = {
+    "Physics": [page(i) for i in range(1, 21)] + [subcategory(f"Branch {i}") for i in range(8)],
+    **{f"Branch {i}": [page(100 + 10 * i + j) for j in range(3)] + [subcategory(f"Topic {i}")] for i in range(8)},
+    **{f"Topic {i}": [page(1000 + i), subcategory(f"Too deep {i}")] for i in range(8)},
+}
+
+
+def test_unsharded_frontier_crawls_every_category_down_to_max_depth(tmp_path):
+    frontier = make_frontier(tmp_path)
+    listed, pages = crawl(frontier, LISTINGS)
+    frontier.close()
+    assert listed == {"Physics", *(f"Branch {i}" for i in range(8)), *(f"Topic {i}" for i in range(8))}
+    assert len(pages) == 20 + 8 * 3 + 8
+
+
+def test_shards_split_the_tree_without_gaps(tmp_path):
+    shard_count = 3
+    all_listed, all_pages = [], []
+    for shard_index in range(shard_count):
+        frontier = make_frontier(tmp_path, shard_index, shard_count)
+        listed, pages = crawl(frontier, LISTINGS)
+        frontier.close()
+        all_listed.append(listed - {"Physics"})
+        all_pages.append(pages)
+        # Seed pages are split by page id
+        assert {page_id for page_id in pages if page_id <= 20} == {
+            page_id for page_id in range(1, 21) if page_id % shard_count == shard_index
+        }
+
+    # Every category below the seed and every page is crawled by exactly one shard
+    assert sum(len(listed) for listed in all_listed) == len(set().union(*all_listed)) == 16
+    assert sum(len(pages) for pages in all_pages) == len(set().union(*all_pages)) == 20 + 8 * 3 + 8
+    # A subtree stays with the shard of its top subcategory
+    for listed in all_listed:
+        for i in range(8):
+            assert (f"Branch {i}" in listed) == (f"Topic {i}" in listed)
+
+
+def test_known_articles_are_not_pending(tmp_path):
+    frontier = make_frontier(tmp_path)
+    category = frontier.next_category(MAIN_CATEGORY)
+    new_pages, new_categories = frontier.record_listing(
+        MAIN_CATEGORY, category, [page(1), page(2), page(3)], "next", KnownArticles({2})
+    )
+    assert (new_pages, new_categories) == (2, 0)
+    assert [page["page_id"] for page in frontier.pending_pages(MAIN_CATEGORY)] == [1, 3]
+    # The listing continues where it stopped
+    assert frontier.next_category(MAIN_CATEGORY)["cmcontinue"] == "next"
+    frontier.close()
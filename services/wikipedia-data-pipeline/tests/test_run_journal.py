@@ -0,0 +1,112 @@
+import json
+import numpy as np
+from run_journal import RunJournal
+
+
+def make_article(article_id: int, embedding: list[float] | None = None) -> dict:
+    article = {"article_id": article_id, "article_title": f"Article {article_id}"}
+    if embedding is not None:
+        article["article_embedding"] = embedding
+    return article
+
+
+def test_unfinished_articles_resume_from_their_last_stage(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.record("fetched", make_article(1))
+    journal.record("fetched", make_article(2))
+    journal.record("embedded", make_article(2, [0.5, -0.25, 1.0]))
+    journal.record("fetched", make_article(3))
+    journal.record("embedded", make_article(3, [0.0, 1.0, 0.0]))
+    journal.record("summarized", make_article(3, [0.0, 1.0, 0.0]))
+    journal.record_upserted([3])
+    journal.close()
+
+    resumed = RunJournal(path)
+    assert [article["article_id"] for article in resumed.resumable("fetched")] == [1]
+    [embedded] = resumed.resumable("embedded")
+    assert embedded["article_id"] == 2
+    np.testing.assert_allclose(embedded["article_embedding"], [0.5, -0.25, 1.0])
+    assert resumed.resumable("summarized") == []
+    assert set(resumed.pending) == {1, 2}
+    resumed.close()
+
+
+def test_journal_is_compacted_on_opening(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    for stage in ("fetched", "embedded", "summarized"):
+        journal.record(stage, make_article(1, [1.0, 0.0]))
+    journal.record("fetched", make_article(2))
+    journal.record_upserted([2])
+    journal.record_dropped([3], "near_duplicate")
+    journal.close()
+
+    RunJournal(path).close()
+    with open(path) as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry["stage"] for entry in entries] == ["dropped", "summarized"]
+    assert entries[0]["article_ids"] == [3]
+    assert entries[1]["article"]["article_id"] == 1
+
+
+def test_cut_short_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.record("fetched", make_article(1))
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"stage": "fetched", "article": {"article_')
+
+    resumed = RunJournal(path)
+    assert list(resumed.pending) == [1]
+    resumed.close()
+
+
+def test_dropped_articles_are_never_resumed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.record("summarized", make_article(1, [1.0]))
+    journal.record_dropped([1], "rejected")
+    journal.close()
+
+    resumed = RunJournal(path)
+    assert resumed.pending == {}
+    assert resumed.dropped == {1}
+    resumed.close()
+
+
+def test_articles_are_retired_after_max_resumes(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path, max_resumes=2)
+    journal.record("fetched", make_article(1))
+    journal.record("fetched", make_article(2))
+    journal.close()
+
+    for _ in range(2):
+        journal = RunJournal(path, max_resumes=2)
+        assert journal.retired == []
+        # Article 2 is upserted on the first resume, article 1 keeps failing
+        journal.record_resumed(list(journal.pending))
+        journal.record_upserted([2])
+        journal.close()
+
+    journal = RunJournal(path, max_resumes=2)
+    assert journal.retired == [1]
+    assert journal.pending == {}
+    assert journal.dropped == {1}
+    journal.close()
+
+    # The retirement survives the compaction
+    journal = RunJournal(path, max_resumes=2)
+    assert journal.retired == []
+    assert journal.dropped == {1}
+    journal.close()
+
+
+def test_journal_without_path_keeps_nothing():
+    journal = RunJournal(None)
+    journal.record("fetched", make_article(1))
+    journal.record_dropped([1], "near_duplicate")
+    assert journal.pending == {}
+    journal.close()
@@ -0,0 +1,352 @@
+import json
+import os
+import shutil
+import threading
+from typing import Callable
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Flat index of article embeddings in memory-mapped files.
+
+    Embeddings are stored unit-normalized as float32, so a cosine similarity
+    is a dot product and a batch of queries is scored with a single matrix
+    product per chunk of the index. The files grow by doubling and only the
+    rows a search touches are paged in, so the index can outgrow the memory
+    of a container.
+
+    The directory holds vectors.f32 and ids.i64 (capacity rows each),
+    tags.json and meta.json with the number of rows in use. meta.json is
+    only rewritten by flush, rows added after the last flush are ignored by
+    the next open. An index is shared by the threads of a run, not by
+    processes.
+    """
+
+    INITIAL_CAPACITY = 1024
+    # Rows fetched per Supabase request when seeding the index
+    PAGE_SIZE = 1000
+    # Ids per Supabase request when adding given articles, bounds the URL length
+    IDS_PER_REQUEST = 200
+    # Rows of the index scored per matrix product, bounds the memory of a search
+    SEARCH_CHUNK_ROWS = 65536
+
+    def __init__(self, directory: str, dimensions: int = 768):
+        """
+        :param directory: Directory of the index files, created if missing.
+        :param dimensions: Dimensions of the embeddings of a new index, until the first add.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        meta_path = os.path.join(directory, "meta.json")
+        meta = {"count": 0, "capacity": 0, "dimensions": dimensions}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        self.count = meta["count"]
+        self.capacity = meta["capacity"]
+        self.dimensions = meta["dimensions"]
+        self.tags: dict[int, list[str]] = {}
+        tags_path = os.path.join(directory, "tags.json")
+        if os.path.exists(tags_path):
+            with open(tags_path) as f:
+                self.tags = {int(article_id): tags for article_id, tags in json.load(f).items()}
+        self._vectors = None
+        self._ids = None
+        self._rows: dict[int, int] = {}
+        self._lock = threading.RLock()
+        if self.capacity:
+            self._map()
+            self._rows = {int(article_id): row for row, article_id in enumerate(self._ids[:self.count])}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, article_id: int) -> bool:
+        return article_id in self._rows
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _map(self) -> None:
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+", shape=(self.capacity, self.dimensions))
+        self._ids = np.memmap(self._path("ids.i64"), dtype=np.int64, mode="r+", shape=(self.capacity,))
+
+    def _grow(self, min_capacity: int) -> None:
+        capacity = max(self.INITIAL_CAPACITY, self.capacity * 2, min_capacity)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._ids.flush()
+            self._vectors = self._ids = None
+        for name, row_size in (("vectors.f32", 4 * self.dimensions), ("ids.i64", 8)):
+            with open(self._path(name), "a+b") as f:
+                f.truncate(capacity * row_size)
+        self.capacity = capacity
+        self._map()
+
+    def _normalize(self, vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add(self, article_ids: list[int], vectors, tags: list[list[str]] | None = None) -> None:
+        """
+        Add or replace the embeddings of articles.
+
+        :param tags: Optional tags of every article, used for the per-tag candidates.
+        """
+        if not article_ids:
+            return
+        with self._lock:
+            self._add(article_ids, vectors, tags)
+
+    def _add(self, article_ids: list[int], vectors, tags: list[list[str]] | None) -> None:
+        if self.capacity == 0:
+            # A new index takes the dimensions of the model it is fed with
+            self.dimensions = len(vectors[0])
+        elif len(vectors[0]) != self.dimensions:
+            raise ValueError(
+                f"Embeddings of {len(vectors[0])} dimensions can't join the {self.dimensions}-dimension "
+                f"vector index in {self.directory}, truncated embeddings need an index of their own"
+            )
+        vectors = self._normalize(vectors)
+        new_ids = [article_id for article_id in dict.fromkeys(article_ids) if article_id not in self._rows]
+        if self.count + len(new_ids) > self.capacity:
+            self._grow(self.count + len(new_ids))
+        for article_id in new_ids:
+            self._rows[article_id] = self.count
+            self._ids[self.count] = article_id
+            self.count += 1
+        for index, article_id in enumerate(article_ids):
+            self._vectors[self._rows[article_id]] = vectors[index]
+            if tags is not None:
+                self.tags[article_id] = tags[index]
+
+    def search(self, queries, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k cosine search of a batch of queries.
+
+        :return: The article ids and similarities of the hits, shaped
+                 (queries, min(k, len(self))), best first.
+        """
+        queries = self._normalize(queries)
+        k = min(k, self.count)
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.count, self.SEARCH_CHUNK_ROWS):
+            end = min(start + self.SEARCH_CHUNK_ROWS, self.count)
+            scores = np.concatenate([best_scores, queries @ self._vectors[start:end].T], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return np.asarray(self._ids[best_rows.ravel()]).reshape(best_rows.shape), best_scores
+
+    def near_duplicates(self, article_ids: list[int], vectors, threshold: float) -> list[bool]:
+        """
+        Tell which articles are near-duplicates of an indexed article or of
+        an earlier article of the batch. An article never matches itself.
+
+        :param threshold: Cosine similarity from which two articles are duplicates.
+        """
+        vectors = self._normalize(vectors)
+        duplicates = np.zeros(len(vectors), dtype=bool)
+        if self.count:
+            # The second hit is needed when the first one is the article itself
+            hit_ids, scores = self.search(vectors, k=2)
+            for index, article_id in enumerate(article_ids):
+                duplicates[index] = any(
+                    hit_id != article_id and score >= threshold
+                    for hit_id, score in zip(hit_ids[index], scores[index])
+                )
+        similarities = vectors @ vectors.T
+        for index in range(len(vectors)):
+            if not duplicates[index]:
+                duplicates[index + 1:] |= similarities[index, index + 1:] >= threshold
+        return duplicates.tolist()
+
+    def add_unique(self, article_ids: list[int], vectors, tags: list[list[str]], threshold: float) -> list[bool]:
+        """
+        Add the articles that are not near-duplicates, at once, so concurrent
+        batches can't both add the two articles of a duplicate pair.
+
+        :return: Which articles were near-duplicates and left out.
+        """
+        with self._lock:
+            duplicates = self.near_duplicates(article_ids, vectors, threshold)
+            kept = [index for index, duplicate in enumerate(duplicates) if not duplicate]
+            self.add([article_ids[index] for index in kept], [vectors[index] for index in kept], [tags[index] for index in kept])
+        return duplicates
+
+    def candidates(self, queries: dict[str, any], k: int) -> dict[str, list[int]]:
+        """
+        The ids of the k articles closest to every query vector, keyed like
+        queries. Longer queries, like full profile embeddings of an index of
+        truncated embeddings, are truncated to the index's dimensions.
+        """
+        if not queries:
+            return {}
+        hit_ids, _ = self.search(
+            np.stack([np.asarray(vector, dtype=np.float32)[:self.dimensions] for vector in queries.values()]),
+            k
+        )
+        return {key: hit_ids[index].tolist() for index, key in enumerate(queries)}
+
+    def candidates_by_tag(self, k: int) -> dict[str, list[int]]:
+        """
+        The ids of the k articles closest to the centroid of every tag's articles.
+        """
+        rows_by_tag: dict[str, list[int]] = {}
+        for article_id, tags in self.tags.items():
+            if article_id in self._rows:
+                for tag in tags:
+                    rows_by_tag.setdefault(tag, []).append(self._rows[article_id])
+        return self.candidates(
+            {tag: np.asarray(self._vectors[sorted(rows)]).mean(axis=0) for tag, rows in rows_by_tag.items()},
+            k
+        )
+
+    def seed_from_supabase(self, supabase, table: str = "articles", prepare: Callable | None = None) -> None:
+        """
+        Add every stored article with an embedding, PAGE_SIZE rows at a time,
+        to build the index of a tree that was stored before it existed.
+
+        :param prepare: Applied to every stored embedding, to truncate it like the index's.
+        """
+        prepare = prepare or _parse_vector
+        start = 0
+        while True:
+            result = (
+                supabase.table(table)
+                .select("article_id, article_embedding, tags")
+                .order("article_id")
+                .range(start, start + self.PAGE_SIZE - 1)
+                .execute()
+            )
+            rows = [row for row in result.data if row.get("article_embedding")]
+            self.add(
+                [row["article_id"] for row in rows],
+                # pgvector columns are returned as their text form
+                [prepare(_parse_vector(row["article_embedding"])) for row in rows],
+                [row.get("tags") or [] for row in rows]
+            )
+            if len(result.data) < self.PAGE_SIZE:
+                break
+            start += self.PAGE_SIZE
+
+    def sync_from_supabase(self, supabase, stored_ids, table: str = "articles", prepare: Callable | None = None) -> int:
+        """
+        Add the stored articles the index is missing, like the ones of a
+        backfill or of a run that crashed before its flush. An empty index
+        is seeded with a scan of the whole table instead.
+
+        :param stored_ids: Ids of every stored article.
+        :param prepare: Applied to every stored embedding, to truncate it like the index's.
+        :return: The number of articles added.
+        """
+        prepare = prepare or _parse_vector
+        count = self.count
+        if not count:
+            self.seed_from_supabase(supabase, table, prepare)
+            return self.count
+        missing = sorted(article_id for article_id in stored_ids if article_id not in self._rows)
+        for start in range(0, len(missing), self.IDS_PER_REQUEST):
+            rows = (
+                supabase.table(table)
+                .select("article_id, article_embedding, tags")
+                .in_("article_id", missing[start:start + self.IDS_PER_REQUEST])
+                .execute()
+                .data
+            )
+            rows = [row for row in rows if row.get("article_embedding")]
+            self.add(
+                [row["article_id"] for row in rows],
+                [prepare(_parse_vector(row["article_embedding"])) for row in rows],
+                [row.get("tags") or [] for row in rows]
+            )
+        return self.count - count
+
+    def flush(self) -> None:
+        """
+        Write the added rows and tags to disk, they are seen by the next open from then on.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._ids.flush()
+        for name, content in (
+            ("tags.json", {str(article_id): tags for article_id, tags in self.tags.items()}),
+            ("meta.json", {"count": self.count, "capacity": self.capacity, "dimensions": self.dimensions}),
+        ):
+            tmp_path = self._path(f"{name}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(content, f)
+            os.replace(tmp_path, self._path(name))
+
+
+def copy_index(source: str, destination: str) -> bool:
+    """
+    Copy the flushed rows of the index in source to destination, for
+    instance to seed the index of a backfill shard with the main one.
+
+    :return: Whether there was an index to copy.
+    """
+    if not os.path.exists(os.path.join(source, "meta.json")):
+        return False
+    os.makedirs(destination, exist_ok=True)
+    # meta.json first, rows flushed after it was read are beyond its count and ignored
+    for name in ("meta.json", "tags.json", "ids.i64", "vectors.f32"):
+        if os.path.exists(os.path.join(source, name)):
+            shutil.copyfile(os.path.join(source, name), os.path.join(destination, name))
+    return True
+
+
+def _parse_vector(value) -> list[float]:
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def publish_feed_candidates(supabase, vector_index: VectorIndex, k: int, prepare: Callable | None = None) -> int:
+    """
+    Store the k closest articles of every tag and of every user profile in
+    the feed_candidates table, so the feed reads a short list of ids
+    instead of ranking the whole articles table.
+
+    Rows are keyed by candidate_key, tag:<tag> or profile:<user_id>. The
+    table is created by sql/feed_candidates.sql.
+
+    :param prepare: Applied to every profile embedding, to truncate it like the index's.
+
+    :return: The number of candidate lists stored.
+    """
+    from datetime import datetime, timezone
+    prepare = prepare or _parse_vector
+    candidates = {f"tag:{tag}": ids for tag, ids in vector_index.candidates_by_tag(k).items()}
+    profiles = supabase.table("preferences").select("user_id, profile_embedding").execute().data
+    candidates.update(vector_index.candidates(
+        {
+            f"profile:{row['user_id']}": prepare(_parse_vector(row["profile_embedding"]))
+            for row in profiles
+            if row.get("profile_embedding")
+        },
+        k
+    ))
+    if not candidates:
+        return 0
+    updated_at = datetime.now(timezone.utc).isoformat()
+    supabase.table("feed_candidates").upsert(
+        [{"candidate_key": key, "article_ids": ids, "updated_at": updated_at} for key, ids in candidates.items()],
+        on_conflict="candidate_key"
+    ).execute()
+    return len(candidates)
@@ -8,218 +8,961 @@ Each run retrieves a batch of articles across different categories
 like science, history, and technology.
 """
 
-import requests
-import random
+import asyncio
+import aiohttp
+import math
 import urllib.parse
 import os
 import modal
+from functools import partial
+from typing import Callable
+from async_http_client import AsyncHttpClient
+from bulk_writer import BulkWriter, MemorySink, classify_sink_error
+from category_frontier import CategoryFrontier
+from embedding_cache import EmbeddingCache
+from embedding_codec import EmbeddingCodec
+from known_articles import KnownArticles, load_known_articles
+from scrollpedia_common.metrics import metrics
+from scrollpedia_common.resilience import ProviderPolicy
+from run_journal import STAGES, RunJournal
 from gemini_service import GeminiService
 from summarization_service import SummarizationService
+from stage_queue import StageClosed, StageQueue
+from vector_index import VectorIndex, copy_index, publish_feed_candidates
 
-function_image = modal.Image.debian_slim().pip_install(["requests", "supabase", "google-genai"])
+# Prefix of the metrics of the run reports
+metrics.namespace = "scrollpedia_pipeline"
+
+# scrollpedia_common is shipped from its local install (pip install -e services/common)
+function_image = (
+    modal.Image.debian_slim()
+    .pip_install(["requests", "aiohttp", "supabase", "google-genai", "numpy"])
+    .add_local_python_source("scrollpedia_common")
+)
 app = modal.App("scrollpedia-wikipedia-data-pipeline", image=function_image)
+# Survives between scheduled runs, holds the embedding cache, the crawl frontier and the vector index
+CACHE_DIR = "/cache"
+cache_volume = modal.Volume.from_name("scrollpedia-pipeline-cache", create_if_missing=True)
 
-def get_wikipedia_articles(secrets=dict[str, str]) -> list[dict[str, any]]:
-    API_URL = "https://en.wikipedia.org/w/api.php"
-    BASE_WIKI_URL = "https://en.wikipedia.org/wiki/"
-    GEMINI_KEY = secrets.get("GEMINI_KEY")
-    SUMMARIZATION_SERVICE_URL = secrets.get("SUMMARIZATION_SERVICE_URL")
-    SUMMARIZATION_SERVICE_ENDPOINT = secrets.get("SUMMARIZATION_SERVICE_ENDPOINT") or "summarize"
-
-    categories = {
-        "Artificial Intelligence": ["Artificial intelligence"],
-        "Space Exploration": ["Space exploration"],
-        "World Wars": ["World War II"],
-        "Hollywood & Cinema": ["Film"],
-        "Music History": ["Music"],
-        "Olympics & Global Sports": ["Olympic Games"],
-        "Physics & Chemistry": ["Physics"],
-        "Medical Innovations": ["Medicine"],
-        "Environmental Science": ["Environmental science"],
-        "Global Politics": ["Politics"],
-        "Stock Market & Economy": ["Economics"],
-        "Philosophy & Ethics": ["Philosophy"],
-        "Psychology & Neuroscience": ["Neuroscience"],
-        "Modern Literature": ["Literature"]
-    }
-    headers = {
-        'User-Agent': 'WikipediaScraper/1.0 (contact@wikitok.com)'
-    }
-    articles_list = []
-    MAX_ARTICLES = 26
-    base_params = {
-        "action": "query",
-        "format": "json",
-        "formatversion": "2"
-    }
+API_URL = "https://en.wikipedia.org/w/api.php"
+BASE_WIKI_URL = "https://en.wikipedia.org/wiki/"
+HEADERS = {
+    'User-Agent': 'WikipediaScraper/1.0 (contact@wikitok.com)'
+}
+CATEGORIES = {
+    "Artificial Intelligence": ["Artificial intelligence"],
+    "Space Exploration": ["Space exploration"],
+    "World Wars": ["World War II"],
+    "Hollywood & Cinema": ["Film"],
+    "Music History": ["Music"],
+    "Olympics & Global Sports": ["Olympic Games"],
+    "Physics & Chemistry": ["Physics"],
+    "Medical Innovations": ["Medicine"],
+    "Environmental Science": ["Environmental science"],
+    "Global Politics": ["Politics"],
+    "Stock Market & Economy": ["Economics"],
+    "Philosophy & Ethics": ["Philosophy"],
+    "Psychology & Neuroscience": ["Neuroscience"],
+    "Modern Literature": ["Literature"]
+}
+BASE_PARAMS = {
+    "action": "query",
+    "format": "json",
+    "formatversion": "2"
+}
+MAX_ARTICLES = 26
+ARTICLES_PER_CATEGORY = 4
+# categorymembers requests per main category and run, at least, raised to
+# LISTINGS_PER_ARTICLE requests per article of the category's budget
+MAX_ATTEMPTS_PER_CATEGORY = 20
+LISTINGS_PER_ARTICLE = 0.25
+# Runs an unfinished article is resumed by before it is given up on
+MAX_RESUMES = 3
+# Intro extracts are capped at 20 pages per request by the TextExtracts API
+TITLES_PER_BATCH = 20
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+# Defaults of the knobs below can be overridden with the secret of the same
+# name. Number of in-flight requests per host
+WIKIPEDIA_CONCURRENCY = 8
+# Levels of subcategories crawled below the categories of CATEGORIES
+CATEGORY_MAX_DEPTH = 2
+# Members per categorymembers request, MediaWiki allows up to 500
+CATEGORY_PAGE_SIZE = 100
+# Requests per second to each provider, lowered on the fly when it throttles
+WIKIPEDIA_RATE_LIMIT = 20
+GEMINI_RATE_LIMIT = GeminiService.DEFAULT_RATE_LIMIT
+SUMMARIZATION_RATE_LIMIT = SummarizationService.DEFAULT_RATE_LIMIT
+# Workers of each stage
+FETCH_WORKERS = 2
+EMBED_WORKERS = 1
+AUDIO_WORKERS = 2
+# Articles per request to the summarization service's batch route, which
+# summarizes them concurrently
+AUDIO_BATCH_SIZE = 16
+# "batch" waits for the summaries on a /summarize/batch request, "jobs" queues
+# them to the service's job workers and polls them, overridable with the
+# SUMMARIZATION_MODE secret
+SUMMARIZATION_MODE = "batch"
+# Seconds between polls of the summarization jobs, and before giving up on them
+SUMMARIZATION_JOB_POLL_INTERVAL = 5
+SUMMARIZATION_JOB_TIMEOUT = 900
+# Items waiting between two stages before the upstream one is held back
+STAGE_QUEUE_SIZE = 64
+# Rows per Supabase upsert, and size bound of its JSON payload
+UPSERT_BATCH_SIZE = 50
+UPSERT_MAX_BYTES = 1_000_000
+# Upserts in flight at once, and upserts per second
+UPSERT_CONCURRENCY = 4
+UPSERT_RATE_LIMIT = 10
+# Seconds a batching stage waits for its batch to fill up
+BATCH_MAX_WAIT = 0.5
+# Cosine similarity from which a new article is a near-duplicate of one
+# already indexed, overridable with the NEAR_DUPLICATE_THRESHOLD secret
+NEAR_DUPLICATE_THRESHOLD = 0.97
+# Articles precomputed per tag and per user profile for the feed
+FEED_CANDIDATES = 50
+# Whether the candidates are stored, set the PUBLISH_FEED_CANDIDATES secret to
+# 1 once the feed_candidates table of sql/feed_candidates.sql is created
+PUBLISH_FEED_CANDIDATES = 0
+# Shard of the page ids a run works on, set by the backfill
+SHARD_INDEX = 0
+SHARD_COUNT = 1
+# Default number of parallel workers of a backfill, and the time limit of one
+BACKFILL_SHARDS = 8
+BACKFILL_TIMEOUT = 6 * 60 * 60
+# Default size bound of the embedding cache, overridable with the
+# EMBEDDING_CACHE_MAX_ENTRIES secret
+DEFAULT_EMBEDDING_CACHE_MAX_ENTRIES = 50000
+# Precision and dimensions of the embeddings as dtype[:dimensions] (see
+# EmbeddingCodec), overridable with the EMBEDDING_CODEC secret. int8 is a
+# quarter of the size, truncating also needs the profile embeddings and the
+# articles column truncated the same way.
+EMBEDDING_CODEC = "float32"
+# Environment variables of the scheduler secret handed to the pipeline
+PIPELINE_SECRETS = [
+    "GEMINI_KEY",
+    "SUMMARIZATION_SERVICE_URL",
+    "SUMMARIZATION_SERVICE_BATCH_ENDPOINT",
+    "SUMMARIZATION_SERVICE_JOBS_ENDPOINT",
+    "SUMMARIZATION_MODE",
+    "SUMMARIZATION_JOB_POLL_INTERVAL",
+    "SUMMARIZATION_JOB_TIMEOUT",
+    "EMBEDDING_CACHE_PATH",
+    "EMBEDDING_CACHE_MAX_ENTRIES",
+    "EMBEDDING_CODEC",
+    "FRONTIER_PATH",
+    "JOURNAL_PATH",
+    "VECTOR_INDEX_PATH",
+    "NEAR_DUPLICATE_THRESHOLD",
+    "FEED_CANDIDATES",
+    "PUBLISH_FEED_CANDIDATES",
+    "CATEGORY_MAX_DEPTH",
+    "CATEGORY_PAGE_SIZE",
+    "MAX_ARTICLES",
+    "ARTICLES_PER_CATEGORY",
+    "MAX_ATTEMPTS_PER_CATEGORY",
+    "MAX_RESUMES",
+    "MAX_RESUMED_ARTICLES",
+    "WIKIPEDIA_CONCURRENCY",
+    "WIKIPEDIA_RATE_LIMIT",
+    "GEMINI_RATE_LIMIT",
+    "SUMMARIZATION_RATE_LIMIT",
+    "FETCH_WORKERS",
+    "EMBED_WORKERS",
+    "AUDIO_WORKERS",
+    "AUDIO_BATCH_SIZE",
+    "STAGE_QUEUE_SIZE",
+    "UPSERT_BATCH_SIZE",
+    "UPSERT_MAX_BYTES",
+    "UPSERT_CONCURRENCY",
+    "UPSERT_RATE_LIMIT"
+]
+
+
+def get_setting(secrets: dict[str, str], name: str) -> int:
+    """
+    Read an integer knob from the secrets, defaulting to the module constant of the same name.
+    """
+    return int(secrets.get(name) or globals()[name])
+
+
+class ArticleSlots:
+    """
+    Shared budget of articles across the concurrently running categories.
+
+    The fetch stage reserves a slot for every article it accepts, both in the
+    run total and in the article's main category, so the fan-out never hands
+    more articles to the paid embedding and summarization stages than a run
+    stores.
+    """
+
+    def __init__(self, limit: int, per_category_limit: int):
+        self.limit = limit
+        self.per_category_limit = per_category_limit
+        self.reserved = 0
+        self.reserved_per_category = {}
+
+    def reserve(self, main_category: str) -> bool:
+        if self.exhausted or self.category_exhausted(main_category):
+            return False
+        self.reserved += 1
+        self.reserved_per_category[main_category] = self.reserved_per_category.get(main_category, 0) + 1
+        return True
+
+    def category_exhausted(self, main_category: str) -> bool:
+        return self.reserved_per_category.get(main_category, 0) >= self.per_category_limit
+
+    @property
+    def exhausted(self) -> bool:
+        return self.reserved >= self.limit
+
+
+def get_wikipedia_articles(secrets=dict[str, str], known_articles: KnownArticles | None = None) -> list[dict[str, any]]:
+    """
+    Fetch a batch of articles across all categories.
+
+    Blocking entry point kept for callers of the synchronous API, the work is
+    done by run_pipeline on a fresh event loop and every row is collected.
+    """
+    sink = MemorySink()
+    asyncio.run(run_pipeline(secrets, sink, known_articles))
+    return list(sink.rows.values())
+
+
+async def run_pipeline(
+    secrets: dict[str, str],
+    sink: Callable[[list[dict[str, any]]], None],
+    known_articles: KnownArticles | None = None,
+) -> int:
+    """
+    Run the streaming pipeline: discover -> fetch -> embed -> audio -> upsert.
+
+    Stages run concurrently, each with its own number of workers, and are
+    connected by bounded StageQueues so memory stays flat whatever the
+    number of articles. Finished rows are handed to sink as soon as they are
+    ready, in chunks of up to UPSERT_BATCH_SIZE rows and UPSERT_MAX_BYTES,
+    UPSERT_CONCURRENCY chunks at once.
+
+    With a JOURNAL_PATH, every completed stage is checkpointed and the
+    articles an interrupted run left unfinished are resumed from their last
+    completed stage first, up to MAX_RESUMED_ARTICLES of them (MAX_ARTICLES
+    by default) on top of the new ones. An article is given up on after
+    MAX_RESUMES resumes, and rows sink rejects for good are dropped from the
+    journal. sink has to be idempotent, a row can be handed to it again when
+    a run stopped right after upserting it.
+
+    With a VECTOR_INDEX_PATH, embedded articles too similar to an indexed one
+    are dropped before their audio summary, the others are indexed.
+
+    :param sink: Called from a worker thread with every chunk of rows, for
+                 instance to upsert them. Transient failures are retried.
+    :param known_articles: Ids of the articles already stored, these are
+                           dropped as soon as they are listed.
+    :return: The number of rows handed to sink.
+    :raises RuntimeError: If sink failed for some of the rows with transient errors.
+    """
+    if known_articles is None:
+        known_articles = KnownArticles()
+    slots = ArticleSlots(get_setting(secrets, "MAX_ARTICLES"), get_setting(secrets, "ARTICLES_PER_CATEGORY"))
+    # Listings yield fewer new articles per request as a run asks for more of them
+    max_attempts = max(
+        get_setting(secrets, "MAX_ATTEMPTS_PER_CATEGORY"),
+        math.ceil(min(slots.per_category_limit, slots.limit) * LISTINGS_PER_ARTICLE)
+    )
+    queue_size = get_setting(secrets, "STAGE_QUEUE_SIZE")
+    fetch_workers = get_setting(secrets, "FETCH_WORKERS")
+    embed_workers = get_setting(secrets, "EMBED_WORKERS")
+    audio_workers = get_setting(secrets, "AUDIO_WORKERS")
+
+    # Every queue after discovered is also fed by a resume_stage
+    discovered = StageQueue(queue_size, producers=len(CATEGORIES))
+    fetched = StageQueue(queue_size, producers=fetch_workers + 1)
+    embedded = StageQueue(queue_size, producers=embed_workers + 1)
+    summarized = StageQueue(queue_size, producers=audio_workers + 1)
+
+    codec = EmbeddingCodec.from_spec(secrets.get("EMBEDDING_CODEC") or EMBEDDING_CODEC)
+    # Without a path near-duplicates are kept
+    vector_index = None
+    if secrets.get("VECTOR_INDEX_PATH"):
+        vector_index = VectorIndex(vector_index_path(secrets["VECTOR_INDEX_PATH"], codec))
+    near_duplicate_threshold = float(secrets.get("NEAR_DUPLICATE_THRESHOLD") or NEAR_DUPLICATE_THRESHOLD)
+    journal = RunJournal(secrets.get("JOURNAL_PATH"), codec=codec, max_resumes=get_setting(secrets, "MAX_RESUMES"))
+    if journal.retired:
+        print(f"Log: Giving up on {len(journal.retired)} articles resumed {journal.max_resumes} times")
+        metrics.increment("articles_skipped", len(journal.retired), reason="resume_limit")
+    # Unfinished and dropped articles must not be picked again, whether resumed by this run or not
+    for article_id in [*journal.pending, *journal.dropped]:
+        known_articles.add(article_id)
+    # Resumed articles have their own budget, the closest to done first
+    resume_budget = int(secrets.get("MAX_RESUMED_ARTICLES") or get_setting(secrets, "MAX_ARTICLES"))
+    resumed = {}
+    for stage in reversed(STAGES):
+        resumed[stage] = journal.resumable(stage)[:max(resume_budget, 0)]
+        resume_budget -= len(resumed[stage])
+        if resumed[stage]:
+            print(f"Log: Resuming {len(resumed[stage])} articles after the {stage} stage")
+            metrics.increment("articles_resumed", len(resumed[stage]), stage=stage)
+    journal.record_resumed([article["article_id"] for articles in resumed.values() for article in articles])
+
+    # One Gemini client for the whole run
+    embedding_cache = None
+    if secrets.get("EMBEDDING_CACHE_PATH"):
+        embedding_cache = EmbeddingCache(
+            secrets.get("EMBEDDING_CACHE_PATH"),
+            max_entries=int(secrets.get("EMBEDDING_CACHE_MAX_ENTRIES") or DEFAULT_EMBEDDING_CACHE_MAX_ENTRIES)
+        )
+    # A run is a batch job, MediaWiki and Gemini are waited for when their
+    # circuit is open, while articles are stored without audio when the
+    # summarization service is down
+    wikipedia_policy = ProviderPolicy("wikipedia", rate=get_setting(secrets, "WIKIPEDIA_RATE_LIMIT"), wait_when_open=True)
+    # Without a path the crawl state only lives as long as the run
+    frontier = CategoryFrontier(
+        secrets.get("FRONTIER_PATH") or ":memory:",
+        max_depth=get_setting(secrets, "CATEGORY_MAX_DEPTH"),
+        shard_index=get_setting(secrets, "SHARD_INDEX"),
+        shard_count=get_setting(secrets, "SHARD_COUNT")
+    )
+    gemini_service = GeminiService(
+        secrets.get("GEMINI_KEY"),
+        cache=embedding_cache,
+        policy=ProviderPolicy("gemini", rate=get_setting(secrets, "GEMINI_RATE_LIMIT"), wait_when_open=True),
+        codec=codec
+    )
+    summarization_service = SummarizationService(
+        policy=ProviderPolicy("summarization", rate=get_setting(secrets, "SUMMARIZATION_RATE_LIMIT"))
+    )
+    # Supabase errors that aren't transient, like constraint violations, are not retried
+    writer = BulkWriter(
+        sink,
+        max_rows=get_setting(secrets, "UPSERT_BATCH_SIZE"),
+        max_bytes=get_setting(secrets, "UPSERT_MAX_BYTES"),
+        concurrency=get_setting(secrets, "UPSERT_CONCURRENCY"),
+        policy=ProviderPolicy("supabase", rate=get_setting(secrets, "UPSERT_RATE_LIMIT"), classify=classify_sink_error)
+    )
+    upsert_report = {"rows": 0, "failed_rows": 0, "rejected_rows": 0}
+
+    try:
+        async with AsyncHttpClient(
+            headers=HEADERS,
+            per_host_limit=get_setting(secrets, "WIKIPEDIA_CONCURRENCY"),
+            policy=wikipedia_policy
+        ) as client:
+            await asyncio.gather(
+                *(
+                    discover_stage(
+                        client,
+                        main_category,
+                        sub_categories,
+                        slots,
+                        known_articles,
+                        frontier,
+                        get_setting(secrets, "CATEGORY_PAGE_SIZE"),
+                        max_attempts,
+                        discovered
+                    )
+                    for main_category, sub_categories in CATEGORIES.items()
+                ),
+                *(fetch_stage(client, slots, known_articles, frontier, journal, discovered, fetched) for _ in range(fetch_workers)),
+                *(
+                    embed_stage(gemini_service, vector_index, near_duplicate_threshold, known_articles, journal, fetched, embedded)
+                    for _ in range(embed_workers)
+                ),
+                *(audio_stage(secrets, summarization_service, journal, embedded, summarized) for _ in range(audio_workers)),
+                upsert_stage(writer, codec, journal, summarized, upsert_report),
+                resume_stage(resumed["fetched"], fetched),
+                resume_stage(resumed["embedded"], embedded),
+                resume_stage(resumed["summarized"], summarized),
+            )
+    finally:
+        journal.close()
+        frontier.close()
+        if vector_index is not None:
+            vector_index.flush()
+        if embedding_cache is not None:
+            embedding_cache.close()
+        writer.close()
+
+    print(f"Log: Upserted {upsert_report['rows']} rows at {writer.rows_per_second:.1f} rows/s")
+    if upsert_report["rejected_rows"]:
+        print(f"Log: {upsert_report['rejected_rows']} rows were rejected and dropped")
+    if upsert_report["failed_rows"]:
+        raise RuntimeError(f"{upsert_report['failed_rows']} rows failed to upsert, {upsert_report['rows']} rows were stored")
+    return upsert_report["rows"]
+
+
+async def resume_stage(articles: list[dict[str, any]], outbox: StageQueue) -> None:
+    """
+    Step 0: Queue the articles an earlier run left unfinished for the stage after their last completed one.
+    """
+    try:
+        for article in articles:
+            await outbox.put(article)
+    finally:
+        await outbox.close()
 
-    for main_category, sub_categories in categories.items():
-        if len(articles_list) >= MAX_ARTICLES:
-            break
 
-        articles_fetched = 0
-        attempts = 0
+async def discover_stage(
+    client: AsyncHttpClient,
+    main_category: str,
+    sub_categories: list[str],
+    slots: ArticleSlots,
+    known_articles: KnownArticles,
+    frontier: CategoryFrontier,
+    page_size: int,
+    max_attempts: int,
+    outbox: StageQueue,
+) -> None:
+    """
+    Step 1: Crawl the category tree of one main category and queue unseen pages for fetching.
 
-        while articles_fetched < 4 and attempts < 20 and len(articles_list) < MAX_ARTICLES:
-            subcategory = random.choice(sub_categories)
+    Pages left pending by earlier runs go first, then the frontier's next
+    category is listed page_size members at a time, each listing picking up
+    where the previous one stopped, up to max_attempts listings.
+    """
+    frontier.seed(main_category, sub_categories)
+    attempts = 0
+    last_seq = 0
+    restarted = False
+
+    try:
+        while not slots.exhausted and not slots.category_exhausted(main_category):
+            pending = frontier.pending_pages(main_category, after_seq=last_seq, limit=TITLES_PER_BATCH)
+            if pending:
+                last_seq = pending[-1]["seq"]
+                # Stored since they were listed, by an earlier run or another category
+                frontier.mark_done([page["page_id"] for page in pending if page["page_id"] in known_articles])
+                for page in pending:
+                    if page["page_id"] in known_articles:
+                        metrics.increment("articles_skipped", reason="duplicate")
+                        continue
+                    await outbox.put({
+                        "page_id": page["page_id"],
+                        "title": page["title"],
+                        "main_category": main_category,
+                        "subcategory": page["subcategory"]
+                    })
+                continue
+
+            if attempts >= max_attempts:
+                metrics.increment("categories_out_of_attempts", main_category=main_category)
+                break
+            category = frontier.next_category(main_category)
+            if category is None:
+                if restarted:
+                    break
+                # The whole tree was crawled, start over to catch the pages added since
+                print(f"Category tree of {main_category} fully crawled, starting a new pass")
+                frontier.restart(main_category)
+                restarted = True
+                continue
             attempts += 1
 
             try:
-                # Step 1: Get articles from category
-                category_params = base_params.copy()
+                category_params = BASE_PARAMS.copy()
                 category_params.update({
                     "list": "categorymembers",
-                    "cmtype": "page",
-                    "cmtitle": f"Category:{subcategory}",
-                    "cmlimit": "10"
+                    "cmtype": "page|subcat",
+                    "cmtitle": f"Category:{category['title']}",
+                    "cmlimit": str(page_size)
                 })
+                if category["cmcontinue"]:
+                    category_params["cmcontinue"] = category["cmcontinue"]
 
-                response = requests.get(API_URL, headers=headers, params=category_params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
+                with metrics.span("mediawiki_request", call="categorymembers"):
+                    data = await client.get_json(API_URL, params=category_params)
 
-                articles = data["query"]["categorymembers"]
-                if not articles:
-                    print(f"No articles found in Category:{subcategory}")
-                    continue
+                members = data["query"]["categorymembers"]
+                new_pages, new_categories = frontier.record_listing(
+                    main_category,
+                    category,
+                    members,
+                    data.get("continue", {}).get("cmcontinue"),
+                    known_articles
+                )
+                metrics.increment("discover_attempts", result="listed" if new_pages else "nothing_new")
+                metrics.increment("articles_listed", new_pages)
+                metrics.increment("categories_discovered", new_categories)
 
-                selected_articles = random.sample(articles, min(6, len(articles)))
-
-                for article in selected_articles:
-                    if len(articles_list) >= MAX_ARTICLES:
-                        break
-                    title = article["title"]
-
-                    # Step 2: Get summary, image, and pageid
-                    article_params = base_params.copy()
-                    article_params.update({
-                        "prop": "extracts|images",
-                        "exintro": "1",
-                        "exlimit": "1",
-                        "explaintext": "1",
-                        "titles": title
-                    })
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Network error processing {category['title']}: {str(e)}")
+                metrics.increment("discover_attempts", result="network_error")
+                continue
+            except Exception as e:
+                print(f"General error processing {category['title']}: {str(e)}")
+                metrics.increment("discover_attempts", result="error")
+                continue
+    finally:
+        await outbox.close()
 
-                    article_response = requests.get(API_URL, headers=headers, params=article_params, timeout=10)
-                    article_response.raise_for_status()
-                    article_data = article_response.json()
-                    pages = article_data["query"]["pages"]
-                    if not pages:
-                        continue
 
-                    page = pages[0]
-                    if "missing" in page or "pageid" not in page:
-                        continue
+async def fetch_stage(
+    client: AsyncHttpClient,
+    slots: ArticleSlots,
+    known_articles: KnownArticles,
+    frontier: CategoryFrontier,
+    journal: RunJournal,
+    inbox: StageQueue,
+    outbox: StageQueue,
+) -> None:
+    """
+    Step 2: Resolve queued titles TITLES_PER_BATCH at a time, across categories,
+    and queue the accepted articles for embedding.
 
-                    page_id = page["pageid"]
-                    summary = page.get("extract", "No summary available")
-                    if summary == "No summary available" or not summary.strip():
-                        continue
-                    summary = summary[:500] + "..." if len(summary) > 500 else summary
-
-                    # Step 3: Get image URL
-                    image_url = "No image found"
-                    if "images" in page:
-                        for img in page["images"]:
-                            if img["title"].endswith((".jpg", ".png", ".jpeg")):
-                                img_params = base_params.copy()
-                                img_params.update({
-                                    "prop": "imageinfo",
-                                    "iiprop": "url",
-                                    "titles": img["title"]
-                                })
-                                img_response = requests.get(API_URL, headers=headers, params=img_params, timeout=10)
-                                img_data = img_response.json()
-                                img_pages = img_data["query"]["pages"]
-                                if not img_pages:
-                                    continue
-                                img_page = img_pages[0]
-                                if "imageinfo" in img_page:
-                                    image_url = img_page["imageinfo"][0]["url"]
-                                    break
-                    if image_url == "No image found":
-                        continue
-                    article_url = f"{BASE_WIKI_URL}{urllib.parse.quote(title.replace(' ', '_'))}"
-
-                    # Step 4: Now get the embedding for the article
-                    # Include, heading, summary, and tags
-                    article_embedding = GeminiService(GEMINI_KEY).get_text_embedding(
-                        data={
-                            "heading": title,
-                            "summary": summary,
-                            "tags": [main_category, subcategory]
-                        })
-                    if not article_embedding:
-                        # Bruh simply skip this article
-                        print(f"Failed to get embedding for id: {page_id} and title: {title}")
-                        continue
-                    audio_data = SummarizationService().get_article_audio_data(
-                        data={
-                            "article_id": page_id,
-                            "article_title": title,
-                            "article_description": summary
-                        },
-                        service_base_url=SUMMARIZATION_SERVICE_URL,
-                        endpoint=SUMMARIZATION_SERVICE_ENDPOINT
-                    )
-                    audio_data = audio_data.get("data").get("audio_data")
-                    print(f"Audio data for {page_id}: {audio_data}")
-                    if not audio_data:
-                        # Still we can save the article, audio isn't mandatory
-                        print(f"Failed to get audio summary link for id: {page_id} and title: {title}")
-
-                    article_dict = {
-                        "article_id": page_id,
-                        "article_data" : {
-                            "article_image": image_url,
-                            "article_summary": summary,
-                            "article_sub_tag": subcategory,
-                            "article_heading": title,
-                            "article_link": article_url
-                        },
-                        "article_embedding": article_embedding,
-                        "audio_data": audio_data if audio_data else None,
-                        "tags": [main_category, subcategory]
-                    }
-                    articles_list.append(article_dict)
-                    articles_fetched += 1
-                    print(f"Fetched article: {title}")
-
-            except requests.RequestException as e:
-                print(f"Network error processing {subcategory}: {str(e)}")
+    Resolved pages are marked done in the frontier, the ones there was no
+    room left for stay pending for the next run.
+    """
+    try:
+        while True:
+            try:
+                candidates = await inbox.get_batch(TITLES_PER_BATCH, BATCH_MAX_WAIT)
+            except StageClosed:
+                break
+            # Don't resolve titles we have no room left for
+            candidates = [
+                candidate for candidate in candidates
+                if not slots.exhausted and not slots.category_exhausted(candidate["main_category"])
+            ]
+            if not candidates:
+                continue
+
+            try:
+                pages = await fetch_article_pages(client, [candidate["title"] for candidate in candidates])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Network error fetching {len(candidates)} articles: {str(e)}")
+                metrics.increment("articles_skipped", len(candidates), reason="fetch_error")
                 continue
             except Exception as e:
-                print(f"General error processing {subcategory}: {str(e)}")
+                print(f"General error fetching {len(candidates)} articles: {str(e)}")
+                metrics.increment("articles_skipped", len(candidates), reason="fetch_error")
                 continue
 
-    return articles_list
+            left_over = set()
+            for candidate in candidates:
+                page = pages.get(candidate["title"])
+                if page is None:
+                    metrics.increment("articles_skipped", reason="missing")
+                    continue
+                article_dict = parse_article_page(page, candidate["main_category"], candidate["subcategory"])
+                if article_dict is None:
+                    continue
+                # The accepted ones are added to the known articles so no other
+                # category picks them again
+                if article_dict["article_id"] in known_articles:
+                    metrics.increment("articles_skipped", reason="duplicate")
+                    continue
+                if not slots.reserve(candidate["main_category"]):
+                    metrics.increment("articles_skipped", reason="over_budget")
+                    left_over.add(candidate["page_id"])
+                    continue
+                metrics.increment("articles_accepted")
+                known_articles.add(article_dict["article_id"])
+                print(f"Fetched article: {article_dict['article_data']['article_heading']}")
+                journal.record("fetched", article_dict)
+                await outbox.put(article_dict)
+            frontier.mark_done([candidate["page_id"] for candidate in candidates if candidate["page_id"] not in left_over])
+    finally:
+        await outbox.close()
+
+
+async def fetch_article_pages(client: AsyncHttpClient, titles: list[str]) -> dict[str, dict[str, any]]:
+    """
+    Resolve extract, pageid and lead image of many titles in a single request.
+
+    Titles are sent as one titles=A|B|C query, with the lead image coming from
+    prop=pageimages in the same call instead of one imageinfo lookup per
+    image file.
+
+    :param titles: At most TITLES_PER_BATCH titles to resolve.
+    :return: The MediaWiki page objects, keyed by the requested title.
+    """
+    batch_params = BASE_PARAMS.copy()
+    batch_params.update({
+        "prop": "extracts|pageimages",
+        "exintro": "1",
+        "exlimit": "max",
+        "explaintext": "1",
+        "piprop": "original",
+        "pilimit": "max",
+        "titles": "|".join(titles)
+    })
+    with metrics.span("mediawiki_request", call="pages"):
+        data = await client.get_json(API_URL, params=batch_params)
+    query = data.get("query", {})
+    # Map titles MediaWiki normalized back to the ones we asked for
+    normalized = {entry["to"]: entry["from"] for entry in query.get("normalized", [])}
+    pages = {}
+    for page in query.get("pages", []):
+        title = page.get("title")
+        pages[normalized.get(title, title)] = page
+    return pages
+
+
+def parse_article_page(page: dict[str, any], main_category: str, subcategory: str) -> dict[str, any] | None:
+    """
+    Build the article record of a resolved page, or None if it has to be skipped.
 
+    The embedding and audio are filled in later by the embed and audio stages.
+    """
+    if "missing" in page or "pageid" not in page:
+        metrics.increment("articles_skipped", reason="missing")
+        return None
 
-@app.function(secrets=[modal.Secret.from_name("scrollpedia-scheduler")], schedule=modal.Period(years=1))
+    page_id = page["pageid"]
+    title = page["title"]
+    summary = page.get("extract", "No summary available")
+    if summary == "No summary available" or not summary.strip():
+        metrics.increment("articles_skipped", reason="no_extract")
+        return None
+    summary = summary[:500] + "..." if len(summary) > 500 else summary
+
+    # Step 3: Get image URL
+    image_url = page.get("original", {}).get("source")
+    if not image_url or not image_url.lower().endswith(IMAGE_EXTENSIONS):
+        metrics.increment("articles_skipped", reason="no_image")
+        return None
+    article_url = f"{BASE_WIKI_URL}{urllib.parse.quote(title.replace(' ', '_'))}"
+
+    return {
+        "article_id": page_id,
+        "article_data" : {
+            "article_image": image_url,
+            "article_summary": summary,
+            "article_sub_tag": subcategory,
+            "article_heading": title,
+            "article_link": article_url
+        },
+        "tags": [main_category, subcategory]
+    }
+
+
+async def embed_stage(
+    gemini_service: GeminiService,
+    vector_index: VectorIndex | None,
+    near_duplicate_threshold: float,
+    known_articles: KnownArticles,
+    journal: RunJournal,
+    inbox: StageQueue,
+    outbox: StageQueue,
+) -> None:
+    """
+    Step 4: Embed queued articles in batches of up to EMBED_BATCH_LIMIT, drop
+    the near-duplicates and queue the others for audio summarization.
+
+    Near-duplicates are dropped from the journal and known, so neither this
+    run nor the next ones work on them again.
+    """
+    try:
+        while True:
+            try:
+                articles = await inbox.get_batch(GeminiService.EMBED_BATCH_LIMIT, BATCH_MAX_WAIT)
+            except StageClosed:
+                break
+            # The Gemini client and the index are blocking, keep them off the event loop
+            articles = await asyncio.to_thread(embed_articles, gemini_service, articles)
+            articles, duplicates = await asyncio.to_thread(drop_near_duplicates, vector_index, articles, near_duplicate_threshold)
+            for article in duplicates:
+                known_articles.add(article["article_id"])
+            journal.record_dropped([article["article_id"] for article in duplicates], "near_duplicate")
+            for article in articles:
+                journal.record("embedded", article)
+                await outbox.put(article)
+    finally:
+        await outbox.close()
+
+
+def embed_articles(gemini_service: GeminiService, articles: list[dict[str, any]]) -> list[dict[str, any]]:
+    """
+    Get the embeddings of all the articles in batched calls.
+
+    :return: The articles that got an embedding, with article_embedding set.
+    """
+    # Include, heading, summary, and tags
+    embeddings = gemini_service.get_text_embeddings([
+        {
+            "heading": article["article_data"]["article_heading"],
+            "summary": article["article_data"]["article_summary"],
+            "tags": article["tags"]
+        }
+        for article in articles
+    ])
+    embedded_articles = []
+    for article, article_embedding in zip(articles, embeddings):
+        if article_embedding is None:
+            # Bruh simply skip this article
+            print(f"Failed to get embedding for id: {article['article_id']} and title: {article['article_data']['article_heading']}")
+            metrics.increment("articles_skipped", reason="embedding_failed")
+            continue
+        article["article_embedding"] = article_embedding
+        embedded_articles.append(article)
+    return embedded_articles
+
+
+def drop_near_duplicates(
+    vector_index: VectorIndex | None,
+    articles: list[dict[str, any]],
+    threshold: float,
+) -> tuple[list[dict[str, any]], list[dict[str, any]]]:
+    """
+    Drop the articles whose embedding is a near-duplicate of an indexed
+    article or of an earlier one of the batch, before any audio is paid
+    for them, and index the others.
+
+    :param vector_index: The index of the articles embedded so far, None keeps every article.
+    :return: The articles to keep and the near-duplicates.
+    """
+    if vector_index is None or not articles:
+        return articles, []
+    duplicates = vector_index.add_unique(
+        [article["article_id"] for article in articles],
+        [article["article_embedding"] for article in articles],
+        [article["tags"] for article in articles],
+        threshold
+    )
+    kept = []
+    dropped = []
+    for article, duplicate in zip(articles, duplicates):
+        if duplicate:
+            print(f"Skipping near-duplicate article id: {article['article_id']} and title: {article['article_data']['article_heading']}")
+            metrics.increment("articles_skipped", reason="near_duplicate")
+            dropped.append(article)
+            continue
+        kept.append(article)
+    return kept, dropped
+
+
+async def audio_stage(
+    secrets: dict[str, str],
+    summarization_service: SummarizationService,
+    journal: RunJournal,
+    inbox: StageQueue,
+    outbox: StageQueue,
+) -> None:
+    """
+    Step 5: Get the audio summaries of queued articles, AUDIO_BATCH_SIZE per
+    request (or per set of jobs) to the summarization service, and queue them
+    for upserting.
+    """
+    SUMMARIZATION_SERVICE_URL = secrets.get("SUMMARIZATION_SERVICE_URL")
+    SUMMARIZATION_SERVICE_BATCH_ENDPOINT = secrets.get("SUMMARIZATION_SERVICE_BATCH_ENDPOINT") or "summarize/batch"
+    SUMMARIZATION_SERVICE_JOBS_ENDPOINT = secrets.get("SUMMARIZATION_SERVICE_JOBS_ENDPOINT") or "summarize/jobs"
+    batch_size = get_setting(secrets, "AUDIO_BATCH_SIZE")
+    if (secrets.get("SUMMARIZATION_MODE") or SUMMARIZATION_MODE) == "jobs":
+        get_audio_data = partial(
+            summarization_service.get_articles_audio_data_from_jobs,
+            service_base_url=SUMMARIZATION_SERVICE_URL,
+            endpoint=SUMMARIZATION_SERVICE_JOBS_ENDPOINT,
+            poll_interval=get_setting(secrets, "SUMMARIZATION_JOB_POLL_INTERVAL"),
+            timeout=get_setting(secrets, "SUMMARIZATION_JOB_TIMEOUT")
+        )
+    else:
+        get_audio_data = partial(
+            summarization_service.get_articles_audio_data,
+            service_base_url=SUMMARIZATION_SERVICE_URL,
+            endpoint=SUMMARIZATION_SERVICE_BATCH_ENDPOINT
+        )
+
+    try:
+        while True:
+            try:
+                articles = await inbox.get_batch(batch_size, BATCH_MAX_WAIT)
+            except StageClosed:
+                break
+            # The summarization client is blocking, keep it off the event loop
+            with metrics.span("summarization_request"):
+                audio_data_by_id = await asyncio.to_thread(
+                    get_audio_data,
+                    data=[
+                        {
+                            "article_id": article["article_id"],
+                            "article_title": article["article_data"]["article_heading"],
+                            "article_description": article["article_data"]["article_summary"]
+                        }
+                        for article in articles
+                    ]
+                ) or {}
+            for article in articles:
+                page_id = article["article_id"]
+                audio_data = audio_data_by_id.get(page_id)
+                print(f"Audio data for {page_id}: {audio_data}")
+                if not audio_data:
+                    # Still we can save the article, audio isn't mandatory
+                    print(f"Failed to get audio summary link for id: {page_id} and title: {article['article_data']['article_heading']}")
+                    metrics.increment("articles_without_audio")
+                article["audio_data"] = audio_data if audio_data else None
+                journal.record("summarized", article)
+                await outbox.put(article)
+    finally:
+        await outbox.close()
+
+
+async def upsert_stage(
+    writer: BulkWriter,
+    codec: EmbeddingCodec,
+    journal: RunJournal,
+    inbox: StageQueue,
+    report: dict[str, int],
+) -> None:
+    """
+    Step 6: Hand finished rows to the writer, with their embedding as a list
+    of floats like the rows of every sink always had. Enough rows are taken
+    at once for the writer to keep all its chunks in flight.
+
+    The rows of a chunk that still fails after its retries are reported and
+    skipped, the other rows are still stored. They stay in the journal, to
+    be upserted by the next run. Rows rejected for good are dropped from
+    the journal instead, retrying them would fail the same way.
+    """
+    while True:
+        try:
+            rows = await inbox.get_batch(writer.max_rows * writer.concurrency, BATCH_MAX_WAIT)
+        except StageClosed:
+            break
+        rows = [{**row, "article_embedding": codec.prepare(row["article_embedding"]).tolist()} for row in rows]
+        with metrics.span("upsert"):
+            written, failed, rejected = await asyncio.to_thread(writer.write, rows)
+        journal.record_upserted([row["article_id"] for row in written])
+        journal.record_dropped([row["article_id"] for row in rejected], "rejected")
+        report["rows"] += len(written)
+        report["failed_rows"] += len(failed)
+        report["rejected_rows"] += len(rejected)
+        metrics.increment("articles_upserted", len(written))
+        if failed:
+            metrics.increment("articles_upsert_failed", len(failed))
+        if rejected:
+            metrics.increment("articles_skipped", len(rejected), reason="rejected")
+
+
+def write_run_report(directory: str) -> None:
+    """
+    Print the run's metrics and write them as <timestamp>.json and
+    <timestamp>.prom (Prometheus text format) into directory.
+    """
+    from datetime import datetime, timezone
+    report = metrics.to_json()
+    print("Log: Run report:", report)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        with open(os.path.join(directory, f"{name}.json"), "w") as f:
+            f.write(report)
+        with open(os.path.join(directory, f"{name}.prom"), "w") as f:
+            f.write(metrics.to_prometheus())
+    except OSError as e:
+        print(f"Error writing run report: {e}")
+
+
+def vector_index_path(path: str, codec: EmbeddingCodec) -> str:
+    """
+    Directory of the vector index of the embeddings of codec: embeddings
+    truncated to different dimensions can't share an index.
+    """
+    return f"{path}-{codec.dimensions}d" if codec.dimensions else path
+
+
+def prepare_vector_index(
+    supabase,
+    path: str,
+    known_articles: KnownArticles,
+    codec: EmbeddingCodec,
+    source: str | None = None,
+) -> None:
+    """
+    Bring the vector index of codec's embeddings up to date with the stored
+    articles, so a run drops the duplicates of every earlier run and
+    backfill. A new index is copied from source when there is one, then the
+    stored articles it is missing are added from Supabase, their embeddings
+    truncated like codec's.
+    """
+    path = vector_index_path(path, codec)
+    if source:
+        source = vector_index_path(source, codec)
+        if not os.path.exists(os.path.join(path, "meta.json")) and copy_index(source, path):
+            print(f"Log: Vector index copied from {source}")
+    vector_index = VectorIndex(path)
+    missing = sum(1 for article_id in known_articles.page_ids if article_id not in vector_index)
+    if not missing:
+        return
+    print(f"Log: Syncing the vector index, {missing} of {len(known_articles)} stored articles missing")
+    try:
+        added = vector_index.sync_from_supabase(supabase, known_articles.page_ids, prepare=codec.prepare)
+        metrics.increment("vector_index_synced", added)
+    except Exception as e:
+        print(f"Error syncing the vector index: {str(e)}")
+    vector_index.flush()
+    print("Log: Vector index synced, count:", len(vector_index))
+
+
+def upsert_articles(supabase, rows: list[dict[str, any]], codec: EmbeddingCodec | None = None) -> None:
+    """
+    Upsert a chunk of articles. Idempotent, rows resumed from the journal can
+    have been stored right before a crash. The stored rows are not sent
+    back, the response would be as large as the request, and embeddings are
+    sent in the text form of a pgvector column, with the digits of codec.
+    """
+    from postgrest.types import ReturnMethod
+    codec = codec or EmbeddingCodec()
+    supabase.table("articles").upsert(
+        [{**row, "article_embedding": codec.to_pgvector(row["article_embedding"])} for row in rows],
+        on_conflict="article_id",
+        ignore_duplicates=True,
+        returning=ReturnMethod.minimal
+    ).execute()
+    print(f"Log: Upserted {len(rows)} articles")
+
+
+@app.function(
+    secrets=[modal.Secret.from_name("scrollpedia-scheduler")],
+    schedule=modal.Period(years=1),
+    volumes={CACHE_DIR: cache_volume}
+)
 def main():
     from supabase import create_client
     from time import time
     start_time = time()
 
     try:
-        # Get the articles
-        print("Log: Fetching articles")
-        articles = get_wikipedia_articles({
-            "GEMINI_KEY": os.environ.get("GEMINI_KEY"),
-            "SUMMARIZATION_SERVICE_URL": os.environ.get("SUMMARIZATION_SERVICE_URL"),
-            "SUMMARIZATION_SERVICE_ENDPOINT": os.environ.get("SUMMARIZATION_SERVICE_ENDPOINT")
-        })
-        print("Log: Articles fetched, count:", len(articles))
-
         url = os.environ.get("SUPABASE_URL")
         key = os.environ.get("SUPABASE_KEY")
         supabase = create_client(url, key)
-        
-        # Now dump all of our articles in the db
-        print("Log: Upserting all the article into DB")
-        result = supabase.table("articles").upsert(articles, on_conflict="article_id", ignore_duplicates=True).execute()
-        print("Log: Upsert result:", result.data)
-        
+
+        # Load the already stored articles so the run only works on new ones
+        print("Log: Loading known articles")
+        with metrics.span("known_articles_load"):
+            known_articles = load_known_articles(
+                supabase,
+                snapshot_path=os.environ.get("KNOWN_ARTICLES_SNAPSHOT_PATH") or f"{CACHE_DIR}/known_articles.bin"
+            )
+        print("Log: Known articles loaded, count:", len(known_articles))
+
+        print("Log: Fetching and upserting articles")
+        secrets = {name: os.environ.get(name) for name in PIPELINE_SECRETS}
+        secrets["EMBEDDING_CACHE_PATH"] = secrets["EMBEDDING_CACHE_PATH"] or f"{CACHE_DIR}/embeddings.sqlite3"
+        secrets["FRONTIER_PATH"] = secrets["FRONTIER_PATH"] or f"{CACHE_DIR}/frontier.sqlite3"
+        secrets["JOURNAL_PATH"] = secrets["JOURNAL_PATH"] or f"{CACHE_DIR}/journal.jsonl"
+        secrets["VECTOR_INDEX_PATH"] = secrets["VECTOR_INDEX_PATH"] or f"{CACHE_DIR}/vector_index"
+        codec = EmbeddingCodec.from_spec(secrets["EMBEDDING_CODEC"] or EMBEDDING_CODEC)
+        prepare_vector_index(supabase, secrets["VECTOR_INDEX_PATH"], known_articles, codec)
+        try:
+            count = asyncio.run(run_pipeline(secrets, lambda rows: upsert_articles(supabase, rows, codec), known_articles=known_articles))
+        finally:
+            write_run_report(os.environ.get("METRICS_REPORT_DIR") or f"{CACHE_DIR}/reports")
+            # Persist the embedding cache, crawl frontier, journal, vector index, known articles snapshot and run report for the next run
+            cache_volume.commit()
+        print("Log: Articles upserted, count:", count)
+
+        if get_setting(secrets, "PUBLISH_FEED_CANDIDATES"):
+            try:
+                count = publish_feed_candidates(
+                    supabase,
+                    VectorIndex(vector_index_path(secrets["VECTOR_INDEX_PATH"], codec)),
+                    get_setting(secrets, "FEED_CANDIDATES"),
+                    prepare=codec.prepare
+                )
+                print("Log: Feed candidate lists stored, count:", count)
+            except Exception as e:
+                # The feed falls back to ranking the articles table
+                print(f"Error storing feed candidates: {str(e)}")
+
         stop_time = time()
         print(f"Log: Total time taken: {stop_time - start_time:.2f} seconds")
         print("Log: Upsert successfull processing for this schedule is completed.")
@@ -227,5 +970,161 @@ def main():
         print(f"Error: {str(e)}")
         raise e
 
+def run_backfill_shard(
+    shard_index: int,
+    shard_count: int,
+    max_articles: int,
+    state_dir: str,
+    sink_factory: Callable[[], Callable[[list[dict[str, any]]], None]] | None = None,
+) -> int:
+    """
+    Store up to max_articles new articles of one shard of the category trees.
+
+    Every shard lists the seed categories but only crawls its own part of
+    the trees (see CategoryFrontier), with its own frontier, journal,
+    embedding cache and vector index under state_dir, so shards never
+    share a SQLite file.
+    The vector index of a shard starts as a copy of the main one, synced
+    with the stored articles, and the main one picks the backfilled articles
+    up on its next sync. Rows are upserted in micro-batches as they are ready.
+
+    :param sink_factory: Makes the sink of the rows instead of upserting them
+                         to Supabase, like MemorySink. The shard then starts
+                         without stored articles and never calls Supabase.
+    :return: The number of rows upserted.
+    """
+    # Containers can be reused for several shards, report each one on its own
+    metrics.reset()
+    shard_dir = os.path.join(state_dir, f"shard-{shard_index}-of-{shard_count}")
+
+    secrets = {name: os.environ.get(name) for name in PIPELINE_SECRETS}
+    secrets.update({
+        "SHARD_INDEX": str(shard_index),
+        "SHARD_COUNT": str(shard_count),
+        "MAX_ARTICLES": str(max_articles),
+        "ARTICLES_PER_CATEGORY": str(math.ceil(max_articles / len(CATEGORIES))),
+        "EMBEDDING_CACHE_PATH": os.path.join(shard_dir, "embeddings.sqlite3"),
+        "FRONTIER_PATH": os.path.join(shard_dir, "frontier.sqlite3"),
+        "JOURNAL_PATH": os.path.join(shard_dir, "journal.jsonl"),
+        "VECTOR_INDEX_PATH": os.path.join(shard_dir, "vector_index"),
+    })
+    codec = EmbeddingCodec.from_spec(secrets["EMBEDDING_CODEC"] or EMBEDDING_CODEC)
+    if sink_factory is None:
+        from supabase import create_client
+        supabase = create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY"))
+        known_articles = load_known_articles(supabase)
+        sink = lambda rows: upsert_articles(supabase, rows, codec)
+    else:
+        # Without stored articles, the vector index has nothing to sync from Supabase
+        supabase = None
+        known_articles = KnownArticles()
+        sink = sink_factory()
+    prepare_vector_index(
+        supabase,
+        secrets["VECTOR_INDEX_PATH"],
+        known_articles,
+        codec,
+        source=os.environ.get("VECTOR_INDEX_PATH") or f"{CACHE_DIR}/vector_index"
+    )
+    try:
+        count = asyncio.run(run_pipeline(secrets, sink, known_articles=known_articles))
+    finally:
+        write_run_report(os.path.join(shard_dir, "reports"))
+    print(f"Log: Shard {shard_index} of {shard_count} upserted {count} articles")
+    if count < max_articles:
+        print(f"Error: Shard {shard_index} of {shard_count} fell short by {max_articles - count} articles, "
+              "its part of the category trees ran out or MAX_ATTEMPTS_PER_CATEGORY was reached")
+    return count
+
+
+@app.function(
+    secrets=[modal.Secret.from_name("scrollpedia-scheduler")],
+    volumes={CACHE_DIR: cache_volume},
+    timeout=BACKFILL_TIMEOUT
+)
+def backfill_shard(shard_index: int, shard_count: int, max_articles: int) -> int:
+    try:
+        return run_backfill_shard(shard_index, shard_count, max_articles, f"{CACHE_DIR}/backfill")
+    finally:
+        cache_volume.commit()
+
+
+def backfill_locally(
+    shards: int,
+    max_articles_per_shard: int,
+    workers: int | None = None,
+    sink_factory: Callable[[], Callable[[list[dict[str, any]]], None]] | None = None,
+) -> list[int | Exception]:
+    """
+    Run the backfill shards in a local process pool instead of Modal
+    containers, with the secrets taken from the environment.
+
+    :param sink_factory: Makes the sink of every shard in its process, see run_backfill_shard.
+    :return: The number of rows upserted by every shard, or the exception it failed with.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    state_dir = os.environ.get("BACKFILL_STATE_DIR") or "backfill_state"
+    counts: list[int | Exception] = [0] * shards
+    with ProcessPoolExecutor(max_workers=workers or shards) as executor:
+        futures = {
+            executor.submit(run_backfill_shard, index, shards, max_articles_per_shard, state_dir, sink_factory): index
+            for index in range(shards)
+        }
+        # A failed shard doesn't hide the outcome of the others
+        for future in as_completed(futures):
+            try:
+                counts[futures[future]] = future.result()
+            except Exception as e:
+                counts[futures[future]] = e
+    return counts
+
+
+@app.local_entrypoint()
+def backfill(shards: int = BACKFILL_SHARDS, max_articles: int = 1000, local: bool = False, sink: str = "supabase"):
+    """
+    Backfill up to max_articles new articles with shards parallel workers:
+
+        modal run wikipedia_data_pipeline.py::backfill --shards 16 --max-articles 5000
+
+    Each worker crawls one shard of the category trees, so the backfill
+    time scales with the number of shards rather than with the size of the
+    corpus. Shards that store fewer articles than their share are reported.
+    --local runs the shards in a local process pool instead, and with
+    --sink memory they keep their rows in memory rather than upserting them
+    to Supabase, to try the crawl out.
+    """
+    from time import time
+    if sink not in ("supabase", "memory"):
+        raise ValueError(f"Unknown sink {sink}, expected supabase or memory")
+    if sink == "memory" and not local:
+        raise ValueError("The memory sink only works with --local")
+    start_time = time()
+    max_articles_per_shard = math.ceil(max_articles / shards)
+
+    if local:
+        counts = backfill_locally(shards, max_articles_per_shard, sink_factory=MemorySink if sink == "memory" else None)
+    else:
+        counts = list(backfill_shard.map(
+            range(shards),
+            [shards] * shards,
+            [max_articles_per_shard] * shards,
+            return_exceptions=True
+        ))
+
+    failed = [index for index, count in enumerate(counts) if isinstance(count, Exception)]
+    for index in failed:
+        print(f"Error: Shard {index} failed: {counts[index]}")
+    short = [
+        index for index, count in enumerate(counts)
+        if not isinstance(count, Exception) and count < max_articles_per_shard
+    ]
+    for index in short:
+        print(f"Error: Shard {index} stored {counts[index]} of its {max_articles_per_shard} articles")
+    print(f"Log: Backfill upserted {sum(count for count in counts if not isinstance(count, Exception))} "
+          f"of {max_articles} articles with {shards} shards in {time() - start_time:.2f} seconds")
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {shards} backfill shards failed, rerun the backfill to resume them")
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file